@@ -0,0 +1,242 @@
+import hashlib
+import os
+import struct
+from tempfile import SpooledTemporaryFile
+from zipfile import BadZipFile, ZipFile, ZIP_DEFLATED, ZIP_STORED
+import zlib
+
+# password for the files in a BrickLink Studio (.io) archive
+ZIP_KEY = b'\x73\x6f\x68\x6f\x30\x39\x30\x39'
+
+# maximum size of an uploaded archive (bytes)
+MAX_UPLOAD_SIZE = int(os.getenv("ISE_MAX_UPLOAD_SIZE", 32*1024*1024))
+
+# maximum (uncompressed) size of an archive member read in memory (bytes)
+MAX_MEMBER_SIZE = int(os.getenv("ISE_MAX_MEMBER_SIZE", 64*1024*1024))
+
+# maximum size of an upload buffered in memory before spilling to disk (bytes)
+SPOOL_SIZE = 1024*1024
+
+# size of chunks read while streaming (bytes)
+CHUNK_SIZE = 128*1024
+
+# local file header layout (see PKWARE APPNOTE 4.3.7)
+LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+LOCAL_HEADER_SIGNATURE = b"PK\003\004"
+
+def _get_crc_table():
+    """
+    Gets the CRC-32 lookup table used by the ZipCrypto key schedule.
+    """
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xEDB88320 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+CRC_TABLE = _get_crc_table()
+
+# ZipCrypto keystream byte indexed by the low 16 bits of the third key
+KEYSTREAM_TABLE = bytes(
+    (((k | 2) * ((k | 2) ^ 1)) >> 8) & 0xFF
+    for k in range(1 << 16)
+)
+
+# ZipCrypto second key increment (k1 + b)*134775813 + 1 less k1*134775813,
+# indexed by the low byte b of the first key
+MULTIPLIER_TABLE = [b*134775813 + 1 for b in range(256)]
+
+def _get_keys(pwd):
+    """
+    Gets the initial ZipCrypto keys for a password.
+    """
+    table = CRC_TABLE
+    k0, k1, k2 = 305419896, 591751049, 878082192
+    for c in pwd:
+        k0 = (k0 >> 8) ^ table[(k0 ^ c) & 0xFF]
+        k1 = ((k1 + (k0 & 0xFF)) * 134775813 + 1) & 0xFFFFFFFF
+        k2 = (k2 >> 8) ^ table[(k2 ^ (k1 >> 24)) & 0xFF]
+    return k0, k1, k2
+
+def decrypt(data, pwd):
+    """
+    Decrypts ZipCrypto data with table lookups in a single inlined loop.
+
+    Args:
+        data (bytes): the encrypted data (including the 12-byte header).
+        pwd (bytes): the password.
+
+    Returns:
+        bytearray: the decrypted data (including the 12-byte header).
+    """
+    table = CRC_TABLE
+    stream = KEYSTREAM_TABLE
+    multiplier = MULTIPLIER_TABLE
+    k0, k1, k2 = _get_keys(pwd)
+    result = []
+    append = result.append
+    for c in data:
+        c ^= stream[k2 & 0xFFFF]
+        append(c)
+        k0 = (k0 >> 8) ^ table[(k0 ^ c) & 0xFF]
+        k1 = (k1 * 134775813 + multiplier[k0 & 0xFF]) & 0xFFFFFFFF
+        k2 = (k2 >> 8) ^ table[(k2 ^ (k1 >> 24)) & 0xFF]
+    return bytearray(result)
+
+class IoArchive(object):
+    """
+    Reader for the password-protected members of a `.io` archive.
+
+    Only the central directory is parsed up front; each requested member is
+    read, decrypted and decompressed on demand so unused members (e.g.,
+    alternate models and instructions) are never touched.
+    """
+    def __init__(self, io_fp, pwd=ZIP_KEY):
+        """
+        Initializes this archive.
+
+        Args:
+            io_fp (file): the `.io` archive file object (seekable).
+            pwd (bytes): the password.
+
+        Raises:
+            BadZipFile: if the archive cannot be read.
+        """
+        self.fp = io_fp
+        self.pwd = pwd
+        with ZipFile(io_fp, 'r') as zip:
+            self.members = {info.filename: info for info in zip.infolist()}
+
+    def read(self, name, max_size=MAX_MEMBER_SIZE):
+        """
+        Reads the contents of a member.
+
+        Args:
+            name (str): the member name.
+            max_size (int): the maximum (uncompressed) member size (bytes).
+
+        Returns:
+            bytes: the member contents.
+
+        Raises:
+            KeyError: if the member does not exist.
+            RuntimeError: if the password is incorrect.
+            BadZipFile: if the member cannot be read.
+            UploadTooLarge: if the member exceeds the maximum size.
+        """
+        info = self.members[name]
+        if info.file_size > max_size:
+            raise UploadTooLarge("File {!r} exceeds {} bytes.".format(name, max_size))
+        if info.compress_type not in (ZIP_STORED, ZIP_DEFLATED) or info.flag_bits & 0x40:
+            # defer unsupported methods (and strong encryption) to zipfile
+            with ZipFile(self.fp, 'r') as zip, zip.open(info, pwd=self.pwd) as member:
+                data = member.read(max_size + 1)
+            if len(data) > max_size:
+                raise UploadTooLarge("File {!r} exceeds {} bytes.".format(name, max_size))
+            return data
+        self.fp.seek(info.header_offset)
+        header = LOCAL_HEADER.unpack(self.fp.read(LOCAL_HEADER.size))
+        if header[0] != LOCAL_HEADER_SIGNATURE:
+            raise BadZipFile("Bad magic number for file header")
+        self.fp.seek(header[10] + header[11], os.SEEK_CUR)
+        data = self.fp.read(info.compress_size)
+        if len(data) != info.compress_size:
+            raise BadZipFile("Truncated file {!r}".format(name))
+        if info.flag_bits & 0x1:
+            data = decrypt(data, self.pwd)
+            # check byte is the high byte of the CRC (or, if streamed, of the
+            # DOS time in the local header)
+            check = header[5] >> 8 if info.flag_bits & 0x8 else info.CRC >> 24
+            if data[11] != check:
+                raise RuntimeError("Bad password for file {!r}".format(name))
+            data = memoryview(data)[12:]
+        if info.compress_type == ZIP_DEFLATED:
+            # inflate at most one byte past the maximum size (the declared
+            # size may be wrong)
+            inflater = zlib.decompressobj(-15)
+            data = inflater.decompress(data, max_size + 1)
+            if len(data) > max_size:
+                raise UploadTooLarge("File {!r} exceeds {} bytes.".format(name, max_size))
+            if not inflater.eof:
+                raise BadZipFile("Truncated file {!r}".format(name))
+        else:
+            data = bytes(data)
+        if zlib.crc32(data) != info.CRC:
+            raise BadZipFile("Bad CRC-32 for file {!r}".format(name))
+        return data
+
+class UploadTooLarge(ValueError):
+    """
+    Raised when an upload exceeds the maximum size.
+    """
+    pass
+
+async def read_upload(upload, max_size=MAX_UPLOAD_SIZE):
+    """
+    Streams an uploaded file into a bounded spooled buffer.
+
+    Args:
+        upload (`:obj:UploadFile`): the uploaded file.
+        max_size (int): the maximum upload size (bytes).
+
+    Returns:
+        `:obj:SpooledTemporaryFile`: the buffer, rewound to the start.
+
+    Raises:
+        UploadTooLarge: if the upload exceeds the maximum size.
+    """
+    buffer = SpooledTemporaryFile(max_size=SPOOL_SIZE)
+    size = 0
+    while True:
+        chunk = await upload.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_size:
+            buffer.close()
+            raise UploadTooLarge("Upload exceeds {} bytes.".format(max_size))
+        buffer.write(chunk)
+    buffer.seek(0)
+    return buffer
+
+def read_design_files(io_fp):
+    """
+    Reads the model and thumbnail from a `.io` archive in memory. The design
+    identifier (SHA-1 of the model) is computed once from the model contents.
+
+    Args:
+        io_fp (file): the `.io` archive file object.
+
+    Returns:
+        (str, str, bytes): the design identifier, the model (LDraw) text and
+            the thumbnail (PNG) contents.
+
+    Raises:
+        BadZipFile: if the archive cannot be read.
+        KeyError: if the archive is missing a required file.
+        RuntimeError: if the archive password is incorrect.
+    """
+    archive = IoArchive(io_fp)
+    design_id, ldr_text = read_design_model(archive)
+    return design_id, ldr_text, archive.read('thumbnail.png')
+
+def read_design_model(archive):
+    """
+    Reads the model from a `.io` archive in memory. The design identifier
+    (SHA-1 of the model) is computed once from the model contents.
+
+    Args:
+        archive (`:obj:IoArchive`): the `.io` archive.
+
+    Returns:
+        (str, str): the design identifier and the model (LDraw) text.
+
+    Raises:
+        BadZipFile: if the archive cannot be read.
+        KeyError: if the archive is missing the model.
+        RuntimeError: if the archive password is incorrect.
+    """
+    ldr = archive.read('model.ldr')
+    return hashlib.sha1(ldr).hexdigest(), ldr.decode('utf-8', 'replace')
@@ -0,0 +1,152 @@
+import numpy as np
+import struct
+
+from .catalog import CATALOG
+
+# identifies the binary brick list format
+MAGIC = b"ISEB"
+VERSION = 1
+
+# header: magic, version, flags, catalog fingerprint, number of bricks,
+# number of distinct rotations and number of undefined part names
+HEADER = struct.Struct("<4sBBIIIH")
+
+# flags for the brick record layout
+FLAG_FLOAT_POSITIONS = 0x1
+FLAG_WIDE_ROTATIONS = 0x2
+
+def _get_brick_dtype(flags):
+    """
+    Gets the brick record layout for a set of flags. The compact layout (no
+    flags) uses 11 bytes per brick.
+    """
+    return np.dtype([
+        ("index", "<u2"),
+        ("ld_color", "<u2"),
+        ("position", "<f8" if flags & FLAG_FLOAT_POSITIONS else "<i2", (3,)),
+        ("rotation", "<u2" if flags & FLAG_WIDE_ROTATIONS else "u1")
+    ])
+
+def encode_bricks(arrays):
+    """
+    Encodes brick arrays in a compact binary format.
+
+    Each brick is recorded by its catalog record index, LDraw color, LDU
+    position and an index into a table of the distinct rotations in the
+    design. Positions fall back to floating point if any brick is not placed
+    on the integer LDU grid (or outside the 16-bit range).
+
+    Args:
+        arrays (dict): the brick arrays (see `utils.parse_ldr`).
+
+    Returns:
+        bytes: the encoded bricks.
+
+    Raises:
+        ValueError: if the bricks cannot be encoded.
+    """
+    positions = np.asarray(arrays["position"], dtype=float)
+    rotations, orientations = np.unique(
+        np.asarray(arrays["rotation"], dtype=float).reshape(-1, 9),
+        axis=0,
+        return_inverse=True
+    )
+    # undefined bricks are recorded by name after the catalog records
+    names = sorted(set(
+        bl_id
+        for bl_id, index in zip(arrays["bl_id"], arrays["index"])
+        if index < 0
+    ))
+    name_index = {
+        name: len(CATALOG.records) + i
+        for i, name in enumerate(names)
+    }
+    if len(CATALOG.records) + len(names) > np.iinfo(np.uint16).max:
+        raise ValueError("Too many brick types to encode.")
+    ld_colors = np.asarray(arrays["ld_color"])
+    if np.any(ld_colors < 0) or np.any(ld_colors > np.iinfo(np.uint16).max):
+        raise ValueError("Brick colors cannot be encoded.")
+    flags = 0
+    if (np.any(positions != np.around(positions))
+            or np.any(np.abs(positions) > np.iinfo(np.int16).max)):
+        flags |= FLAG_FLOAT_POSITIONS
+    if len(rotations) > np.iinfo(np.uint8).max + 1:
+        flags |= FLAG_WIDE_ROTATIONS
+    if len(rotations) > np.iinfo(np.uint16).max + 1:
+        raise ValueError("Too many brick rotations to encode.")
+    encoded_names = [name.encode('utf-8') for name in names]
+    if any(len(name) > np.iinfo(np.uint8).max for name in encoded_names):
+        raise ValueError("Brick name too long to encode.")
+    bricks = np.empty(len(positions), dtype=_get_brick_dtype(flags))
+    bricks["index"] = [
+        index if index >= 0 else name_index[bl_id]
+        for bl_id, index in zip(arrays["bl_id"], arrays["index"])
+    ]
+    bricks["ld_color"] = ld_colors
+    bricks["position"] = positions
+    bricks["rotation"] = orientations.reshape(-1)
+    return b"".join([
+        HEADER.pack(
+            MAGIC, VERSION, flags, CATALOG.fingerprint,
+            len(bricks), len(rotations), len(names)
+        ),
+        rotations.astype("<f8").tobytes(),
+        b"".join(
+            struct.pack("<B", len(name)) + name
+            for name in encoded_names
+        ),
+        bricks.tobytes()
+    ])
+
+def decode_bricks(data):
+    """
+    Decodes brick arrays from the compact binary format without parsing.
+
+    Args:
+        data (bytes): the encoded bricks.
+
+    Returns:
+        dict: the brick arrays (see `utils.parse_ldr`).
+
+    Raises:
+        ValueError: if the data is not valid or was encoded with a different
+            brick catalog.
+    """
+    data = memoryview(data)
+    if len(data) < HEADER.size:
+        raise ValueError("Brick data is truncated.")
+    magic, version, flags, fingerprint, num_bricks, num_rotations, num_names = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Brick data has an unknown format.")
+    if fingerprint != CATALOG.fingerprint:
+        raise ValueError("Brick data was encoded with a different catalog.")
+    offset = HEADER.size
+    rotations = np.frombuffer(
+        data, dtype="<f8", count=9*num_rotations, offset=offset
+    ).reshape(-1, 3, 3)
+    offset += rotations.nbytes
+    names = []
+    for _ in range(num_names):
+        length = data[offset]
+        names.append(bytes(data[offset+1:offset+1+length]).decode('utf-8'))
+        offset += 1 + length
+    bricks = np.frombuffer(
+        data, dtype=_get_brick_dtype(flags), count=num_bricks, offset=offset
+    )
+    codes = bricks["index"].astype(np.int64)
+    defined = codes < len(CATALOG.records)
+    indices = np.where(defined, codes, -1)
+    bl_ids = np.array(
+        [record["bl_id"] for record in CATALOG.records] + names,
+        dtype=object
+    )[codes]
+    positions = bricks["position"].astype(float)
+    rotations = rotations[bricks["rotation"]]
+    return {
+        "bl_id": bl_ids,
+        "ld_color": bricks["ld_color"].astype(np.int64),
+        "index": indices,
+        "position": positions,
+        "rotation": rotations,
+        "vertices": CATALOG.get_vertices_array(indices, rotations, positions)
+    }
@@ -0,0 +1,70 @@
+import os
+import time
+
+# time budget for the analyses of one design (seconds)
+BUDGET_SECONDS = float(os.getenv("ISE_ANALYSIS_BUDGET_SECONDS", 10))
+
+# largest design (in bricks) analyzed per upload
+MAX_BRICKS = int(os.getenv("ISE_MAX_BRICKS", 20000))
+
+# estimated time of a cubic method (dense decomposition or optimal leaf
+# ordering) per cubed number of bricks (seconds)
+CUBIC_SECONDS = 1e-9
+
+class AnalysisBudget(object):
+    """
+    Deadline for the analyses of one design. Methods with cubic cost only run
+    while their estimated time fits in the remaining budget, otherwise the
+    analyses fall back to methods with bounded cost.
+    """
+    def __init__(self, seconds=BUDGET_SECONDS):
+        """
+        Initializes this budget, starting now.
+
+        Args:
+            seconds (float): the time budget (seconds).
+        """
+        self.deadline = time.monotonic() + seconds
+
+    def get_remaining(self):
+        """
+        Gets the remaining time.
+
+        Returns:
+            float: the remaining time (seconds, 0 if exceeded).
+        """
+        return max(self.deadline - time.monotonic(), 0)
+
+    def is_exceeded(self):
+        """
+        Determines whether the deadline has passed.
+
+        Returns:
+            bool: True, if no time remains.
+        """
+        return self.get_remaining() <= 0
+
+    def get_cubic_limit(self, cubic_seconds=CUBIC_SECONDS):
+        """
+        Gets the largest size of a cubic method that fits in the remaining time.
+
+        Args:
+            cubic_seconds (float): the estimated time per cubed size (seconds).
+
+        Returns:
+            int: the largest size.
+        """
+        return int((self.get_remaining()/cubic_seconds)**(1/3))
+
+def get_budget(design):
+    """
+    Gets the time budget of a design, starting on first use (reset when its
+    bricks change).
+
+    Args:
+        design (`:obj:Design`): the design.
+
+    Returns:
+        `:obj:AnalysisBudget`: the time budget.
+    """
+    return design.get_cached("budget", AnalysisBudget)
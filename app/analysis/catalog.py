@@ -0,0 +1,242 @@
+import json
+import numpy as np
+from pkg_resources import resource_stream
+from xml.etree import ElementTree
+import zlib
+
+with open(resource_stream(__name__, '../../resources/bricks.json').name, 'r') as data:
+    BRICK_DATA = json.load(data)
+
+VALID_BL_IDS = []
+with open(resource_stream(__name__, '../../resources/ISE_Palette.xml').name, 'rb') as xml:
+    tree = ElementTree.parse(xml)
+    for item in tree.getroot().iter('ITEM'):
+        bl_id = item.find('ITEMID').text
+        VALID_BL_IDS.append(bl_id)
+    VALID_BL_IDS.append("4345b") # fix BrickLink error (mislabled brick)
+
+# maximum number of cached vertex templates (bounds memory for odd rotations)
+MAX_TEMPLATES = 4096
+
+class BrickCatalog(object):
+    """
+    Compiled, read-only view of the brick data used to parse designs.
+
+    Builds hash indices over the brick data once so each LDraw line is
+    resolved with dictionary lookups instead of list scans, and caches the
+    transformed bounding box vertices for each (brick, rotation) pair.
+    """
+    def __init__(self, brick_data, valid_bl_ids):
+        """
+        Initializes this catalog.
+
+        Args:
+            brick_data (List[dict]): the brick data records.
+            valid_bl_ids (List[str]): the BrickLink identifiers in the palette.
+        """
+        self.records = list(brick_data)
+        self.palette = frozenset(valid_bl_ids)
+        # identifies the record order for data encoded with record indices
+        self.fingerprint = zlib.crc32(
+            json.dumps(self.records, sort_keys=True).encode('utf-8')
+        )
+        self._index = {}
+        self._default_index = {}
+        # first matching record wins, consistent with a linear scan
+        for i, data in enumerate(self.records):
+            self._index.setdefault((data["bl_id"], data.get("ld_color")), i)
+            self._default_index.setdefault(data["bl_id"], i)
+        self._volumes = [
+            float(np.product(data.get("dimensions", [0,0,0])))
+            for data in self.records
+        ]
+        self._raw_vertices = [
+            self._get_raw_vertices(data)
+            for data in self.records
+        ]
+        # stacked vertices with a trailing undefined (NaN) record for index -1
+        self._raw_vertices_array = np.concatenate((
+            np.array(self._raw_vertices, dtype=float).reshape(-1, 8, 3),
+            np.full((1, 8, 3), np.nan)
+        ))
+        # attribute columns with a trailing undefined record for index -1
+        self._columns = {
+            "is_valid": np.array(
+                [data["bl_id"] in self.palette for data in self.records] + [False]
+            ),
+            "volume": np.array(self._volumes + [np.nan])
+        }
+        for key in ("cost", "mass", "safety", "coolness"):
+            self._columns[key] = np.array(
+                [data.get(key, 0) for data in self.records] + [np.nan],
+                dtype=float
+            )
+        for key in ("id", "name", "valid_forward_axes", "bl_color"):
+            self._columns[key] = np.empty(len(self.records) + 1, dtype=object)
+            self._columns[key][:] = [data.get(key, None) for data in self.records] + [None]
+        self._templates = {}
+
+    @staticmethod
+    def _get_raw_vertices(data):
+        """
+        Gets the untransformed bounding box vertices for a brick record.
+        """
+        lower = np.array(data.get("offset", [0,0,0]))
+        upper = lower - np.array(data.get("dimensions", [0,0,0]))
+        return np.array([
+            [lower[0],   lower[1],    lower[2]],
+            [upper[0],   lower[1],    lower[2]],
+            [upper[0],   upper[1],    lower[2]],
+            [upper[0],   upper[1],    upper[2]],
+            [upper[0],   lower[1],    upper[2]],
+            [lower[0],   lower[1],    upper[2]],
+            [lower[0],   upper[1],    upper[2]],
+            [lower[0],   upper[1],    lower[2]],
+        ])
+
+    def get_index(self, bl_id, ld_color=None, fallback=True):
+        """
+        Gets the record index for a brick.
+
+        Args:
+            bl_id (str): the BrickLink brick identifier.
+            ld_color (int): the LDraw color identifier.
+            fallback (bool): True, if the color-less version is used when no
+                record matches the color.
+
+        Returns:
+            int: the record index, or None if the brick is not defined.
+        """
+        if ld_color is not None:
+            index = self._index.get((bl_id, ld_color))
+            if index is not None or not fallback:
+                return index
+        return self._default_index.get(bl_id)
+
+    def get_data(self, bl_id, ld_color=None, fallback=True):
+        """
+        Gets the data for a brick.
+
+        Args:
+            bl_id (str): the BrickLink brick identifier.
+            ld_color (int): the LDraw color identifier.
+            fallback (bool): True, if the color-less version is used when no
+                record matches the color.
+
+        Returns:
+            dict: the brick data, or None if the brick is not defined.
+        """
+        index = self.get_index(bl_id, ld_color, fallback)
+        return self.records[index] if index is not None else None
+
+    def get_volume(self, index):
+        """
+        Gets the bounding box volume of a brick record.
+        """
+        return self._volumes[index]
+
+    def is_valid(self, bl_id):
+        """
+        Determines whether a brick is defined in the palette.
+        """
+        return bl_id in self.palette
+
+    def get_template(self, index, rotation):
+        """
+        Gets the bounding box vertices of a brick record rotated about its
+        origin. Templates are cached per (record, rotation) as designs only
+        use a handful of distinct orientations.
+
+        Args:
+            index (int): the record index.
+            rotation (`:obj:array`): the 3x3 rotation matrix.
+
+        Returns:
+            `:obj:array`: the 8x3 rotated vertices.
+        """
+        key = (index, tuple(np.ravel(rotation).tolist()))
+        template = self._templates.get(key)
+        if template is None:
+            template = np.matmul(
+                self._raw_vertices[index],
+                np.transpose(rotation)
+            )
+            if len(self._templates) < MAX_TEMPLATES:
+                self._templates[key] = template
+        return template
+
+    def get_vertices(self, index, rotation, position):
+        """
+        Gets the bounding box vertices of a brick record placed in a design.
+
+        Args:
+            index (int): the record index.
+            rotation (`:obj:array`): the 3x3 rotation matrix.
+            position (`:obj:array`): the position vector.
+
+        Returns:
+            `:obj:array`: the 8x3 transformed vertices (rounded to 1 LDU).
+        """
+        return np.around(
+            self.get_template(index, rotation) + np.array(position)
+        )
+
+    def get_indices(self, bl_ids, ld_colors):
+        """
+        Gets the record indices for a sequence of bricks, falling back to the
+        color-less version if no record matches the color.
+
+        Args:
+            bl_ids (List[str]): the BrickLink brick identifiers.
+            ld_colors (List[int]): the LDraw color identifiers.
+
+        Returns:
+            `:obj:array`: the record indices (-1 if the brick is not defined).
+        """
+        lookup = {}
+        indices = np.empty(len(bl_ids), dtype=np.int64)
+        for i, key in enumerate(zip(bl_ids, ld_colors)):
+            index = lookup.get(key)
+            if index is None:
+                index = self.get_index(*key)
+                index = lookup[key] = -1 if index is None else index
+            indices[i] = index
+        return indices
+
+    def get_columns(self, indices):
+        """
+        Gets the brick attribute columns for many bricks.
+
+        Args:
+            indices (`:obj:array`): the N record indices (-1 if undefined).
+
+        Returns:
+            dict: the N-element attribute arrays keyed by brick field (NaN or
+                None for undefined bricks).
+        """
+        return {
+            key: column[indices]
+            for key, column in self._columns.items()
+        }
+
+    def get_vertices_array(self, indices, rotations, positions):
+        """
+        Gets the bounding box vertices of many bricks with one batched matmul.
+
+        Args:
+            indices (`:obj:array`): the N record indices (-1 if undefined).
+            rotations (`:obj:array`): the Nx3x3 rotation matrices.
+            positions (`:obj:array`): the Nx3 position vectors.
+
+        Returns:
+            `:obj:array`: the Nx8x3 transformed vertices (rounded to 1 LDU,
+                NaN for undefined bricks).
+        """
+        return np.around(
+            np.matmul(
+                self._raw_vertices_array[indices],
+                np.transpose(rotations, (0, 2, 1))
+            ) + positions[:, np.newaxis, :]
+        )
+
+CATALOG = BrickCatalog(BRICK_DATA, VALID_BL_IDS)
@@ -1,19 +1,38 @@
+import numpy as np
+
 from .dsm import (
-    get_dsm,
     get_complexity_c1,
     get_complexity_c2,
-    get_complexity_c3,
-    get_complexity
+    get_complexity_c3_estimate
 )
+from .budget import get_budget
+from .metrics import metric
+from .spectral import DENSE_LIMIT
 from ..schemas.design import Design
 from ..schemas.cost import (
     CostAnalysis,
+    CostParameters,
     BillOfMaterialsLine,
     AssemblyCostAnalysis,
     OverheadCostAnalysis
 )
 
-__version__ = "2.0.1"
+__version__ = "2.2.0"
+
+# default cost model parameters
+COST_PARAMETERS = CostParameters(overhead=1.10)
+
+# fields derived from the integration complexity
+INTEGRATION_FIELDS = (
+    "assembly.integration",
+    "assembly.total",
+    "overhead.engineering",
+    "overhead.marketing",
+    "overhead.facilities",
+    "overhead.administration",
+    "overhead.total",
+    "total"
+)
 
 def get_cost_analysis(design: Design):
     """
@@ -32,6 +51,7 @@ def get_cost_analysis(design: Design):
         assembly=AssemblyCostAnalysis(
             components=get_cost_assembly_components(design),
             integration=get_cost_assembly_integration(design),
+            integration_error=get_cost_assembly_integration_error(design),
             total=get_cost_assembly_total(design)
         ),
         overhead=OverheadCostAnalysis(
@@ -41,12 +61,51 @@ def get_cost_analysis(design: Design):
             administration=get_cost_overhead_administration(design),
             total=get_cost_overhead_total(design),
         ),
-        total=get_cost_total(design)
+        total=get_cost_total(design),
+        approximate=get_cost_approximate_fields(design)
+    )
+
+def get_cost_analysis_reference(design: Design):
+    """
+    Get the cost analysis for a design with the exact reference methods: a
+    sweep-and-prune search for intersecting bricks and a dense singular value
+    decomposition for the integration complexity at any size (see `engines`).
+
+    Args:
+        design (`:obj:Design`): the design to analyze.
+
+    Returns:
+        `:obj:CostAnalysis`: the cost analysis.
+    """
+    dsm = design.get_valid_bricks().get_adjacency()
+    c3 = get_complexity_c3_estimate(dsm, dense_limit=np.inf)
+    materials = design.get_cost()
+    assembly = (get_complexity_c1(dsm) + get_complexity_c2(dsm)*c3.value)/100
+    return CostAnalysis(
+        version=__version__,
+        materials=materials,
+        bom=get_bom(design),
+        assembly=AssemblyCostAnalysis(
+            components=get_complexity_c1(dsm)/100,
+            integration=get_complexity_c2(dsm)*c3.value/100,
+            integration_error=get_complexity_c2(dsm)*c3.error/100,
+            total=assembly
+        ),
+        overhead=OverheadCostAnalysis(
+            engineering=get_overhead_cost(materials, assembly, COST_PARAMETERS.engineering),
+            marketing=get_overhead_cost(materials, assembly, COST_PARAMETERS.marketing),
+            facilities=get_overhead_cost(materials, assembly, COST_PARAMETERS.facilities),
+            administration=get_overhead_cost(materials, assembly, COST_PARAMETERS.administration),
+            total=get_overhead_cost(materials, assembly, COST_PARAMETERS.get_overhead_rate()),
+        ),
+        total=get_total_cost(materials, assembly)
     )
 
+@metric
 def get_cost_materials(design: Design):
     return design.get_cost()
 
+@metric
 def get_bom(design: Design):
     bom = {}
     for brick in design.get_valid_bricks():
@@ -60,30 +119,94 @@ def get_bom(design: Design):
             )
     return bom
 
+@metric
 def get_cost_assembly_components(design: Design):
-    return get_complexity_c1(get_dsm(design))/100
+    return get_complexity_c1(design.get_adjacency())/100
 
+@metric
+def get_cost_assembly_complexity_c3(design: Design):
+    # exact decomposition only for components that fit in the time budget
+    return get_complexity_c3_estimate(
+        design.get_adjacency(),
+        dense_limit=min(DENSE_LIMIT, get_budget(design).get_cubic_limit())
+    )
+
+@metric
+def get_cost_approximate_fields(design: Design):
+    # (only estimated components have a nonzero error bound, and a partial
+    # search for intersecting bricks misses integration edges)
+    return list(INTEGRATION_FIELDS) if (
+        get_cost_assembly_complexity_c3(design).error > 0 or design.is_overlap_partial()
+    ) else []
+
+@metric
 def get_cost_assembly_integration(design: Design):
-    dsm = get_dsm(design)
-    return get_complexity_c2(dsm)*get_complexity_c3(dsm)/100
+    dsm = design.get_adjacency()
+    return get_complexity_c2(dsm)*get_cost_assembly_complexity_c3(design).value/100
+
+@metric
+def get_cost_assembly_integration_error(design: Design):
+    dsm = design.get_adjacency()
+    return get_complexity_c2(dsm)*get_cost_assembly_complexity_c3(design).error/100
 
+@metric
 def get_cost_assembly_total(design: Design):
-    return get_complexity(get_dsm(design))/100
+    # same as get_complexity(dsm)/100, reusing the complexity c3
+    dsm = design.get_adjacency()
+    return (
+            get_complexity_c1(dsm)
+            + get_complexity_c2(dsm)
+            * get_cost_assembly_complexity_c3(design).value
+        )/100
+
+# cost model formulas (for single designs or arrays of designs)
+
+def get_overhead_cost(materials, assembly, rate):
+    return (materials + assembly) * rate
+
+def get_total_cost(materials, assembly, parameters=COST_PARAMETERS):
+    return materials + assembly + get_overhead_cost(materials, assembly, parameters.get_overhead_rate())
 
+@metric
 def get_cost_overhead_engineering(design: Design):
-    return (get_cost_materials(design) + get_cost_assembly_total(design)) * 0.35
+    return get_overhead_cost(
+            get_cost_materials(design),
+            get_cost_assembly_total(design),
+            COST_PARAMETERS.engineering
+        )
 
+@metric
 def get_cost_overhead_marketing(design: Design):
-    return (get_cost_materials(design) + get_cost_assembly_total(design)) * 0.20
+    return get_overhead_cost(
+            get_cost_materials(design),
+            get_cost_assembly_total(design),
+            COST_PARAMETERS.marketing
+        )
 
+@metric
 def get_cost_overhead_facilities(design: Design):
-    return (get_cost_materials(design) + get_cost_assembly_total(design)) * 0.30
+    return get_overhead_cost(
+            get_cost_materials(design),
+            get_cost_assembly_total(design),
+            COST_PARAMETERS.facilities
+        )
 
+@metric
 def get_cost_overhead_administration(design: Design):
-    return (get_cost_materials(design) + get_cost_assembly_total(design)) * 0.25
+    return get_overhead_cost(
+            get_cost_materials(design),
+            get_cost_assembly_total(design),
+            COST_PARAMETERS.administration
+        )
 
+@metric
 def get_cost_overhead_total(design: Design):
-    return (get_cost_materials(design) + get_cost_assembly_total(design)) * 1.10
+    return get_overhead_cost(
+            get_cost_materials(design),
+            get_cost_assembly_total(design),
+            COST_PARAMETERS.get_overhead_rate()
+        )
 
+@metric
 def get_cost_total(design: Design):
     return get_cost_materials(design) + get_cost_assembly_total(design) + get_cost_overhead_total(design)
@@ -1,11 +1,29 @@
+import os
+
 from scipy.cluster import hierarchy
-from scipy import linalg
+from scipy import sparse
+from scipy.sparse import csgraph
 import numpy as np
 
+from .budget import get_budget
 from ..schemas.design import Design
 from ..schemas.dsm import DesignStructureMatrix
+from .spectral import (
+    DENSE_LIMIT,
+    SpectralEstimate,
+    get_nuclear_norm,
+    get_graph_energy as get_graph_energy_estimate
+)
+
+__version__ = "2.3.0"
+
+# largest design (in bricks) ordered by optimal leaf ordering of a single
+# linkage clustering; larger designs use a reverse Cuthill-McKee ordering
+ORDER_LIMIT = int(os.getenv("ISE_DSM_ORDER_LIMIT", 1000))
 
-__version__ = "2.0.0"
+ORDER_OPTIMAL_LEAF = "optimal_leaf"
+ORDER_REVERSE_CUTHILL_MCKEE = "reverse_cuthill_mckee"
+ORDER_NONE = "none"
 
 def get_dsm_analysis(design: Design):
     """
@@ -17,43 +35,142 @@ def get_dsm_analysis(design: Design):
     Returns:
         `:obj:DesignStructureMatrix`: the design structure matrix.
     """
-    dsm = get_dsm(design)
+    order, order_method = get_dsm_ordering(design)
+    return DesignStructureMatrix(
+        version=__version__,
+        edges=get_dsm_edges(design),
+        labels=get_dsm_labels(design),
+        order=order,
+        order_method=order_method,
+        approximate=get_dsm_approximate_fields(design, order_method)
+    )
+
+def get_dsm_analysis_reference(design: Design):
+    """
+    Get the design structure matrix for a design with the exact reference
+    methods: a sweep-and-prune search for intersecting bricks and optimal leaf
+    ordering at any size (see `engines`).
+
+    Args:
+        design (`:obj:Design`): the design to analyze.
+
+    Returns:
+        `:obj:DesignStructureMatrix`: the design structure matrix.
+    """
+    adjacency = design.get_valid_bricks().get_adjacency()
     return DesignStructureMatrix(
         version=__version__,
-        matrix=dsm,
+        edges=get_edges(adjacency),
         labels=get_dsm_labels(design),
-        order=get_dsm_order(dsm)
+        order=(
+            get_dsm_order(adjacency.toarray())
+            if adjacency.shape[0] >= 2
+            else list(range(adjacency.shape[0]))
+        ),
+        order_method=ORDER_OPTIMAL_LEAF
     )
 
 def get_dsm(design: Design):
-    return [ [ a.intersects(b)
-            for a in design.get_valid_bricks() ]
-            for b in design.get_valid_bricks() ]
+    return get_dsm_array(design).tolist()
+
+def get_dsm_edges(design: Design):
+    return get_edges(design.get_adjacency())
+
+def get_edges(adjacency):
+    # upper triangle (including the diagonal) of the symmetric adjacency
+    edges = sparse.triu(adjacency).tocoo()
+    order = np.lexsort((edges.col, edges.row))
+    return np.stack((edges.row[order], edges.col[order]), axis=1).tolist()
+
+def get_dsm_array(design: Design):
+    # dense view of the sparse adjacency matrix
+    return design.get_adjacency().toarray()
+
+def get_dsm_approximate_fields(design, order_method):
+    # (a partial search for intersecting bricks misses edges, which also
+    # changes the order)
+    if design.is_overlap_partial():
+        return ["edges", "order"]
+    return [] if order_method == ORDER_OPTIMAL_LEAF else ["order"]
 
 def get_dsm_labels(design):
-    return [brick.name for brick in design.get_valid_bricks()]
+    return design.get_valid_bricks().name.tolist()
+
+def get_dsm_ordering(design: Design, limit=ORDER_LIMIT):
+    """
+    Get the row/column order of the design structure matrix, falling back
+    from optimal leaf ordering (quadratic memory, roughly cubic time) to a
+    bandwidth-reducing ordering of the sparse adjacency for large designs or
+    if it does not fit in the time budget (see `budget`), and to no ordering
+    once the time budget is exceeded.
+
+    Args:
+        design (`:obj:Design`): the design to analyze.
+        limit (int): the largest number of bricks for optimal leaf ordering.
+
+    Returns:
+        (list, str): the order indices and the ordering method.
+    """
+    adjacency = design.get_adjacency()
+    if adjacency.shape[0] < 2:
+        return list(range(adjacency.shape[0])), ORDER_OPTIMAL_LEAF
+    budget = get_budget(design)
+    if adjacency.shape[0] <= min(limit, budget.get_cubic_limit()):
+        return get_dsm_order(adjacency.toarray()), ORDER_OPTIMAL_LEAF
+    if not budget.is_exceeded():
+        return get_dsm_order_sparse(adjacency), ORDER_REVERSE_CUTHILL_MCKEE
+    return list(range(adjacency.shape[0])), ORDER_NONE
+
+def get_dsm_order_sparse(adjacency):
+    # components stay contiguous and connected bricks stay close together
+    return csgraph.reverse_cuthill_mckee(
+            adjacency.tocsr(),
+            symmetric_mode=True
+        ).tolist()
 
 def get_dsm_order(dsm):
-    return hierarchy.dendrogram(
-            hierarchy.linkage(dsm, method='single', optimal_ordering=True),
-            no_plot=True
-        )['leaves']
+    # (leaves_list walks the tree iteratively, unlike a dendrogram, which
+    # recurses once per level, e.g., 1000 levels for a chain of bricks)
+    return hierarchy.leaves_list(
+            hierarchy.linkage(dsm, method='single', optimal_ordering=True)
+        ).tolist()
 
 def get_graph_energy(dsm):
-    return np.sum(np.abs(linalg.eig(dsm - np.eye(len(dsm)))[0]))
+    return get_graph_energy_estimate(dsm).value
 
 def get_complexity_c1(dsm, alpha=1):
     # ref: kaushik sinha
-    return np.sum(np.multiply(alpha, np.ones(len(dsm))))
+    return np.sum(np.multiply(alpha, np.ones(np.shape(dsm)[0])))
 
 def get_complexity_c2(dsm, beta=1):
     # ref: kaushik sinha
-    return np.sum(np.multiply(beta, dsm - np.eye(len(dsm))))
+    # (sum of the entries less the diagonal ones, also for a sparse dsm)
+    return np.multiply(beta, np.sum(dsm) - np.shape(dsm)[0])
 
 def get_complexity_c3(dsm, gamma=None):
     # ref: kaushik sinha
-    if gamma is None: gamma = 1/len(dsm)
-    return gamma*np.sum(linalg.svd(dsm)[1])
+    return get_complexity_c3_estimate(dsm, gamma).value
+
+def get_complexity_c3_estimate(dsm, gamma=None, dense_limit=DENSE_LIMIT):
+    """
+    Get the graph energy complexity (C3) with an error bound, estimated for
+    large (sparse) design structure matrices (see `spectral.get_nuclear_norm`).
+
+    Args:
+        dsm (`:obj:array`, `:obj:spmatrix` or list): the design structure matrix.
+        gamma (float): the scaling factor (default: 1/N).
+        dense_limit (int): the maximum size for exact decomposition.
+
+    Returns:
+        `:obj:SpectralEstimate`: the complexity and its error bound.
+    """
+    if not sparse.issparse(dsm):
+        dsm = np.asarray(dsm)
+    # an empty design has no interfaces and hence no structural complexity
+    if dsm.shape[0] == 0: return SpectralEstimate(0.0, 0.0)
+    if gamma is None: gamma = 1/dsm.shape[0]
+    nuclear_norm = get_nuclear_norm(dsm, dense_limit)
+    return SpectralEstimate(gamma*nuclear_norm.value, gamma*nuclear_norm.error)
 
 def get_complexity(dsm, alpha=1, beta=1, gamma=None):
     # ref: kaushik sinha
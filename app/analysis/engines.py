@@ -0,0 +1,256 @@
+import logging
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from pydantic import BaseModel
+
+from ..schemas.design import Design
+from .cost import get_cost_analysis, get_cost_analysis_reference
+from .dsm import ORDER_LIMIT, get_dsm_analysis, get_dsm_analysis_reference
+from .spectral import DENSE_LIMIT
+from .requirements import get_requirements_analysis, get_requirements_analysis_reference
+from .value import get_value_analysis, get_value_analysis_reference
+
+logger = logging.getLogger(__name__)
+
+ENGINE_REFERENCE = "reference"
+ENGINE_FAST = "fast"
+
+# analysis functions by analysis name and engine name: reference engines use
+# the exact per-brick (or dense) methods, fast engines the vectorized (or
+# sparse, estimated) methods
+ENGINES = {
+    "dsm": {
+        ENGINE_REFERENCE: get_dsm_analysis_reference,
+        ENGINE_FAST: get_dsm_analysis
+    },
+    "requirements": {
+        ENGINE_REFERENCE: get_requirements_analysis_reference,
+        ENGINE_FAST: get_requirements_analysis
+    },
+    "cost": {
+        ENGINE_REFERENCE: get_cost_analysis_reference,
+        ENGINE_FAST: get_cost_analysis
+    },
+    "value": {
+        ENGINE_REFERENCE: get_value_analysis_reference,
+        ENGINE_FAST: get_value_analysis
+    }
+}
+
+# relative and absolute tolerance of numeric fields in shadow comparisons
+SHADOW_RTOL = 1e-6
+SHADOW_ATOL = 1e-9
+
+# maximum number of mismatched fields logged per shadow comparison
+SHADOW_LOG_LIMIT = 10
+
+def parse_engines(config, default=None):
+    """
+    Parses an engine configuration: an engine name for all analyses and/or
+    comma-separated `analysis=engine` pairs (e.g., `fast,cost=reference`).
+
+    Args:
+        config (str): the engine configuration.
+        default (str): the engine for analyses not configured.
+
+    Returns:
+        Dict[str, str]: the engine name (or None) by analysis name.
+    """
+    engines = dict((name, default) for name in ENGINES)
+    for entry in filter(None, (entry.strip() for entry in config.split(","))):
+        name, _, engine = entry.rpartition("=")
+        if engine not in (ENGINE_REFERENCE, ENGINE_FAST):
+            raise ValueError("Unknown analysis engine: {}".format(engine))
+        if name and name not in ENGINES:
+            raise ValueError("Unknown analysis: {}".format(name))
+        for analysis in ([name] if name else ENGINES):
+            engines[analysis] = engine
+    return engines
+
+# engine used for the stored analyses
+ANALYSIS_ENGINES = parse_engines(os.getenv("ISE_ANALYSIS_ENGINES", ""), ENGINE_FAST)
+
+# engine run alongside (and compared with) the stored analyses, if any
+SHADOW_ENGINES = parse_engines(os.getenv("ISE_SHADOW_ENGINES", ""))
+
+# fraction of uploads (designs) analyzed in shadow mode
+SHADOW_RATE = float(os.getenv("ISE_SHADOW_RATE", 0.05))
+
+# largest number of valid bricks analyzed in shadow mode (reference engines
+# use dense or optimal leaf ordering methods without a time budget)
+SHADOW_BRICK_LIMIT = min(DENSE_LIMIT, ORDER_LIMIT)
+
+# shadow analyses run in the background, one at a time, and are skipped while
+# too many are pending
+SHADOW_QUEUE_LIMIT = 8
+SHADOW_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow")
+SHADOW_QUEUE = threading.BoundedSemaphore(SHADOW_QUEUE_LIMIT)
+
+def compare_fields(first, second, rtol=SHADOW_RTOL, atol=SHADOW_ATOL, path=""):
+    """
+    Compares every field of two analyses, numbers within a tolerance.
+
+    Args:
+        first (object): the first analysis (model, dict, list or value).
+        second (object): the second analysis.
+        rtol (float): the relative tolerance of numbers.
+        atol (float): the absolute tolerance of numbers.
+        path (str): the path of the compared fields.
+
+    Returns:
+        List[(str, object, object)]: the path and both values of each
+            mismatched field.
+    """
+    if isinstance(first, BaseModel):
+        first = dict(first)
+    if isinstance(second, BaseModel):
+        second = dict(second)
+    if isinstance(first, dict) and isinstance(second, dict):
+        return [
+            mismatch
+            for key in sorted(set(first) | set(second), key=str)
+            for mismatch in (
+                compare_fields(first[key], second[key], rtol, atol, "{}.{}".format(path, key))
+                if key in first and key in second
+                else [("{}.{}".format(path, key), first.get(key), second.get(key))]
+            )
+        ]
+    if isinstance(first, (list, tuple)) and isinstance(second, (list, tuple)):
+        if len(first) != len(second):
+            return [(path + ".length", len(first), len(second))]
+        return [
+            mismatch
+            for i, (first_item, second_item) in enumerate(zip(first, second))
+            for mismatch in compare_fields(first_item, second_item, rtol, atol, "{}[{}]".format(path, i))
+        ]
+    if (
+        isinstance(first, (int, float, np.number))
+        and isinstance(second, (int, float, np.number))
+        and not isinstance(first, (bool, np.bool_))
+        and not isinstance(second, (bool, np.bool_))
+    ):
+        if math.isclose(first, second, rel_tol=rtol, abs_tol=atol) or (
+            math.isnan(first) and math.isnan(second)
+        ):
+            return []
+        return [(path, first, second)]
+    return [] if first == second else [(path, first, second)]
+
+def get_shadow_design(design: Design):
+    """
+    Gets a copy of a design with separate caches for shadow analyses, shared
+    by all shadow analyses of the design.
+
+    Args:
+        design (`:obj:Design`): the design.
+
+    Returns:
+        `:obj:Design`: the shadow design.
+    """
+    return design.get_cached("shadow_design", lambda: Design(**dict(design)))
+
+def is_shadow_sampled(design: Design):
+    """
+    Determines whether a design is analyzed in shadow mode, drawn once per
+    design so a sampled upload compares all of its analyses.
+
+    Args:
+        design (`:obj:Design`): the design.
+
+    Returns:
+        bool: True, if the design is sampled (see `SHADOW_RATE`).
+    """
+    return design.get_cached("shadow_sampled", lambda: random.random() < SHADOW_RATE)
+
+def run_shadow_analysis(name, engine, shadow_engine, shadow_design, analysis, elapsed):
+    """
+    Runs an analysis with the shadow engine and logs the fields that do not
+    match the analysis of the configured engine and the speedup.
+
+    Args:
+        name (str): the analysis name (see `ENGINES`).
+        engine (str): the configured engine name.
+        shadow_engine (str): the shadow engine name.
+        shadow_design (`:obj:Design`): the shadow design (see `get_shadow_design`).
+        analysis (object): the analysis of the configured engine.
+        elapsed (float): the time of the configured engine (seconds).
+    """
+    try:
+        start = time.perf_counter()
+        shadow_analysis = ENGINES[name][shadow_engine](shadow_design)
+        shadow_elapsed = time.perf_counter() - start
+        mismatches = compare_fields(analysis, shadow_analysis)
+    except Exception:
+        logger.exception(
+            "Shadow %s analysis (%s engine) failed for design %s",
+            name, shadow_engine, shadow_design.design_id
+        )
+        return
+    finally:
+        SHADOW_QUEUE.release()
+    if mismatches:
+        logger.warning(
+            "Shadow %s analysis of design %s: %d fields differ between the %s and %s engines: %s",
+            name, shadow_design.design_id, len(mismatches), engine, shadow_engine,
+            "; ".join(
+                "{} ({!r} != {!r})".format(path, first, second)
+                for path, first, second in mismatches[:SHADOW_LOG_LIMIT]
+            )
+        )
+    logger.info(
+        "Shadow %s analysis of design %s: %s engine %.4f s, %s engine %.4f s (%.2fx)",
+        name, shadow_design.design_id, engine, elapsed, shadow_engine, shadow_elapsed,
+        shadow_elapsed/elapsed if elapsed > 0 else math.inf
+    )
+
+def run_analysis(name, design: Design):
+    """
+    Runs an analysis with the configured engine and, in shadow mode, also
+    schedules it with the shadow engine in the background (see
+    `run_shadow_analysis`). Shadow analyses never change, fail or delay the
+    returned analysis and are skipped for designs above `SHADOW_BRICK_LIMIT`.
+
+    Args:
+        name (str): the analysis name (see `ENGINES`).
+        design (`:obj:Design`): the design to analyze.
+
+    Returns:
+        object: the analysis of the configured engine.
+    """
+    engine = ANALYSIS_ENGINES[name]
+    start = time.perf_counter()
+    analysis = ENGINES[name][engine](design)
+    elapsed = time.perf_counter() - start
+    shadow_engine = SHADOW_ENGINES[name]
+    if shadow_engine is None or not is_shadow_sampled(design):
+        return analysis
+    if len(design.get_valid_bricks()) > SHADOW_BRICK_LIMIT:
+        logger.info(
+            "Shadow %s analysis of design %s skipped: more than %d valid bricks",
+            name, design.design_id, SHADOW_BRICK_LIMIT
+        )
+        return analysis
+    if not SHADOW_QUEUE.acquire(blocking=False):
+        logger.info(
+            "Shadow %s analysis of design %s skipped: %d shadow analyses pending",
+            name, design.design_id, SHADOW_QUEUE_LIMIT
+        )
+        return analysis
+    try:
+        SHADOW_EXECUTOR.submit(
+            run_shadow_analysis, name, engine, shadow_engine,
+            get_shadow_design(design), analysis, elapsed
+        )
+    except Exception:
+        SHADOW_QUEUE.release()
+        logger.exception(
+            "Shadow %s analysis (%s engine) failed for design %s",
+            name, shadow_engine, design.design_id
+        )
+    return analysis
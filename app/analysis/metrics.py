@@ -0,0 +1,108 @@
+import functools
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class MetricGraph(object):
+    """
+    Memoized metric values of one design with the dependencies between them.
+
+    Each metric is computed at most once. The metrics it reads while being
+    computed are recorded as its inputs, along with the time it took
+    (including its inputs computed for the first time).
+    """
+    def __init__(self):
+        """
+        Initializes this metric graph.
+        """
+        self.values = {}
+        self.inputs = {}
+        self.timings = {}
+        self._stack = []
+
+    def evaluate(self, name, compute):
+        """
+        Gets the value of a metric, computing it on first use.
+
+        Args:
+            name (str): the metric name.
+            compute (function): computes the metric value.
+
+        Returns:
+            object: the metric value.
+        """
+        if self._stack:
+            self.inputs[self._stack[-1]].add(name)
+        if name not in self.values:
+            self.inputs[name] = set()
+            self._stack.append(name)
+            start = time.perf_counter()
+            try:
+                self.values[name] = compute()
+            finally:
+                self.timings[name] = time.perf_counter() - start
+                self._stack.pop()
+        return self.values[name]
+
+    def get_report(self):
+        """
+        Gets the evaluated metrics, slowest first.
+
+        Returns:
+            List[(str, float, List[str])]: the name, time (seconds) and
+                sorted input names of each metric.
+        """
+        return sorted(
+            (
+                (name, self.timings[name], sorted(self.inputs[name]))
+                for name in self.values
+            ),
+            key=lambda entry: entry[1],
+            reverse=True
+        )
+
+def get_metric_graph(design):
+    """
+    Gets the metric graph of a design (reset when its bricks change).
+
+    Args:
+        design (`:obj:Design`): the design.
+
+    Returns:
+        `:obj:MetricGraph`: the metric graph.
+    """
+    return design.get_cached("metric_graph", MetricGraph)
+
+def log_metric_report(design):
+    """
+    Logs the evaluated metrics of a design with their times and inputs,
+    slowest first (at debug level).
+
+    Args:
+        design (`:obj:Design`): the design.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    for name, seconds, inputs in get_metric_graph(design).get_report():
+        logger.debug(
+            "Metric %s of design %s: %.4f s (inputs: %s)",
+            name, design.design_id, seconds, ", ".join(inputs) or "none"
+        )
+
+def metric(function):
+    """
+    Decorates a metric function of a design so it is computed once per design
+    and recorded in the design's metric graph (see `get_metric_graph`).
+
+    Args:
+        function (function): the metric function (design as only argument).
+
+    Returns:
+        function: the memoized metric function.
+    """
+    name = "{}.{}".format(function.__module__.rsplit('.', 1)[-1], function.__name__)
+    @functools.wraps(function)
+    def wrapper(design):
+        return get_metric_graph(design).evaluate(name, lambda: function(design))
+    return wrapper
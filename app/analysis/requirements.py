@@ -1,30 +1,85 @@
 import numpy as np
+from scipy.sparse import csgraph
 
+from .metrics import metric
 from ..schemas.design import Design
 from ..schemas.requirements import (
     RequirementsAnalysis,
     ValidBricksRequirement,
     FullyConnectedRequirement,
-    SteeringWheelRequirement,
-    SeatRequirement,
-    WheelRequirement,
-    HeadlightRequirement,
-    TaillightRequirement,
-    LicensePlateRequirement
+    PartRule,
+    PartRequirement
 )
 
-__version__ = "2.0.0"
+__version__ = "2.1.0"
+
+# part rules by requirement name: requirements named after a field of the
+# requirements analysis fill that field, others are additional requirements
+PART_RULES = {
+    "is_one_steering_wheel": PartRule(
+        bl_ids=["3829c01"],
+        count=1,
+        exact=True
+    ),
+    "is_min_one_seat_aligned": PartRule(
+        bl_ids=["4079b"],
+        count=1,
+        aligned=True
+    ),
+    "is_min_four_wheels_aligned_on_bottom": PartRule(
+        bl_ids=["30027bc01"],
+        count=4,
+        aligned=True,
+        face="bottom"
+    ),
+    "is_min_two_headlights_aligned_on_front": PartRule(
+        bl_ids=["54200", "98138"],
+        bl_color=12,
+        count=2,
+        aligned=True,
+        face="front"
+    ),
+    "is_min_two_taillights_aligned_on_back": PartRule(
+        bl_ids=["54200", "98138"],
+        bl_color=17,
+        count=2,
+        aligned=True,
+        face="back"
+    ),
+    "is_one_license_plate_aligned_on_back": PartRule(
+        bl_ids=["3069b"],
+        bl_color=3,
+        count=1,
+        exact=True,
+        aligned=True,
+        face="back"
+    )
+}
+
+# names of all requirements (see `RequirementsAnalysis`)
+REQUIREMENT_NAMES = ("is_only_valid_bricks", "is_fully_connected") + tuple(PART_RULES)
 
-def get_requirements_analysis(design: Design):
+def get_requirements_analysis(design: Design, part_requirements=None, num_components=None):
     """
     Get the requirements analysis for a design.
 
     Args:
         design (`:obj:Design`): the design to analyze.
+        part_requirements (Dict[str, `:obj:PartRequirement`]): the evaluated
+            part rules (see `evaluate_part_rules`), if already evaluated.
+        num_components (int): the number of connected components, if
+            already counted (exactly).
 
     Returns:
         `:obj:RequirementsAnalysis`: the requirements analysis.
     """
+    if part_requirements is None:
+        part_requirements = get_part_requirements(design)
+    if num_components is None:
+        num_components = count_components(design)
+        approximate = get_requirements_approximate_fields(design)
+    else:
+        approximate = []
     return RequirementsAnalysis(
         version=__version__,
         is_only_valid_bricks=ValidBricksRequirement(
@@ -32,232 +87,214 @@ def get_requirements_analysis(design: Design):
             invalid_bricks=get_invalid_bricks(design)
         ),
         is_fully_connected=FullyConnectedRequirement(
-            value=is_fully_connected(design),
-            count=count_components(design)
-        ),
-        is_one_steering_wheel=SteeringWheelRequirement(
-            value=is_one_steering_wheel(design),
-            count=count_steering_wheels(design)
-        ),
-        is_min_one_seat_aligned=SeatRequirement(
-            value=is_min_one_seat_aligned(design),
-            count=count_seats(design),
-            alignment=is_seat_aligned(design)
-        ),
-        is_min_four_wheels_aligned_on_bottom=WheelRequirement(
-            value=is_min_four_wheels_aligned_on_bottom(design),
-            count=count_wheels(design),
-            alignment=is_wheel_aligned(design),
-            positioning=is_wheel_on_bottom(design)
+            value=num_components == 1,
+            count=num_components
         ),
-        is_min_two_headlights_aligned_on_front=HeadlightRequirement(
-            value=is_min_two_headlights_aligned_on_front(design),
-            count=count_headlights(design),
-            alignment=is_headlight_aligned(design),
-            positioning=is_headlight_on_front(design)
-        ),
-        is_min_two_taillights_aligned_on_back=TaillightRequirement(
-            value=is_min_two_taillights_aligned_on_back(design),
-            count=count_taillights(design),
-            alignment=is_taillight_aligned(design),
-            positioning=is_taillight_on_back(design)
-        ),
-        is_one_license_plate_aligned_on_back=LicensePlateRequirement(
-            value=is_one_license_plate_aligned_on_back(design),
-            count=count_license_plates(design),
-            alignment=is_license_plate_aligned(design),
-            positioning=is_license_plate_on_back(design)
-        ),
-        is_valid=is_valid(design)
+        **{
+            name: requirement.dict()
+            for name, requirement in part_requirements.items()
+            if name in RequirementsAnalysis.__fields__
+        },
+        additional_requirements={
+            name: requirement
+            for name, requirement in part_requirements.items()
+            if name not in RequirementsAnalysis.__fields__
+        },
+        is_valid=is_valid(design, part_requirements, num_components),
+        approximate=approximate
     )
 
-def is_only_valid_bricks(design: Design):
-    return len(get_invalid_bricks(design)) == 0
+def get_face_axis(design: Design, face):
+    """
+    Get a unit vector pointing to a face of a design.
 
-def get_invalid_bricks(design: Design):
-    return [brick.bl_id for brick in design.get_invalid_bricks()]
+    Args:
+        design (`:obj:Design`): the design.
+        face (str): the face (front, back or bottom).
 
-def is_fully_connected(design: Design):
-    return count_components(design) == 1
+    Returns:
+        `:obj:array`: the unit vector.
+    """
+    if face == "front":
+        return design.get_forward_axis()
+    if face == "back":
+        return np.negative(design.get_forward_axis())
+    if face == "bottom":
+        return np.negative(design.get_top_axis())
+    raise ValueError("Unknown face: {}".format(face))
+
+def evaluate_part_rules(design: Design, rules):
+    """
+    Evaluate part rules over the brick arrays of a design, sharing one
+    alignment test and one face contact test per face between all rules.
 
-def count_components(design: Design):
-    return design.get_num_components()
+    Args:
+        design (`:obj:Design`): the design to analyze.
+        rules (Dict[str, `:obj:PartRule`]): the part rules by name.
 
-def count_seats(design: Design):
-    return sum(
-            1 for brick in design.bricks
-            if brick.bl_id == "4079b"
+    Returns:
+        Dict[str, `:obj:PartRequirement`]: the part requirements by name.
+    """
+    bricks = design.bricks
+    masks = {
+        name: (
+            np.isin(bricks.bl_id, rule.bl_ids)
+            if rule.bl_color is None
+            else np.isin(bricks.bl_id, rule.bl_ids) & (bricks.bl_color == rule.bl_color)
         )
-
-def is_seat_aligned(design: Design):
-    return [
-            brick.is_aligned(design)
-            for brick in design.bricks
-            if brick.bl_id == "4079b"
-        ]
-
-def is_min_one_seat_aligned(design: Design):
-    return bool(
-            sum(
-                is_seat_aligned(design)
-            ) >= 1
+        for name, rule in rules.items()
+    }
+    alignment = design.get_alignment()
+    positioning = {}
+    for face in set(rule.face for rule in rules.values() if rule.face is not None):
+        # test all candidate bricks for a face at once
+        candidates = np.zeros(len(bricks), dtype=bool)
+        for name, rule in rules.items():
+            if rule.face == face:
+                candidates |= masks[name]
+        positioning[face] = np.zeros(len(bricks), dtype=bool)
+        positioning[face][candidates] = design.is_close_to_axis(
+            bricks.select(candidates),
+            get_face_axis(design, face)
         )
-
-def count_cargo_holds(design: Design):
-    return sum(
-            brick.bl_id == "4345"
-            for brick in design.bricks
+    requirements = {}
+    for name, rule in rules.items():
+        mask = masks[name]
+        satisfied = np.ones(np.sum(mask), dtype=bool)
+        if rule.aligned:
+            satisfied &= alignment[mask]
+        if rule.face is not None:
+            satisfied &= positioning[rule.face][mask]
+        requirements[name] = PartRequirement(
+            value=(
+                np.sum(satisfied) == rule.count
+                if rule.exact
+                else np.sum(satisfied) >= rule.count
+            ),
+            count=np.sum(mask),
+            alignment=alignment[mask].tolist() if rule.aligned else None,
+            positioning=positioning[rule.face][mask].tolist() if rule.face is not None else None
         )
+    return requirements
 
-def count_steering_wheels(design: Design):
-    return sum(
-            brick.bl_id == "3829c01"
-            for brick in design.bricks
-        )
+def evaluate_part_rules_reference(design: Design, rules):
+    """
+    Evaluate part rules brick by brick (see `Brick.is_aligned` and
+    `Design.is_close_to_axis`), as a reference for `evaluate_part_rules`.
 
-def is_one_steering_wheel(design: Design):
-    return count_steering_wheels(design) == 1
+    Args:
+        design (`:obj:Design`): the design to analyze.
+        rules (Dict[str, `:obj:PartRule`]): the part rules by name.
 
-def count_wheels(design: Design):
-    return sum(
-            brick.bl_id == "30027bc01"
-            for brick in design.bricks
+    Returns:
+        Dict[str, `:obj:PartRequirement`]: the part requirements by name.
+    """
+    requirements = {}
+    for name, rule in rules.items():
+        bricks = [
+            brick for brick in design.bricks
+            if brick.bl_id in rule.bl_ids
+            and (rule.bl_color is None or brick.bl_color == rule.bl_color)
+        ]
+        alignment = [bool(brick.is_aligned(design)) for brick in bricks]
+        positioning = [
+            bool(design.is_close_to_axis(brick, get_face_axis(design, rule.face)))
+            for brick in bricks
+        ] if rule.face is not None else None
+        satisfied = sum(
+            1 for i in range(len(bricks))
+            if (alignment[i] or not rule.aligned)
+            and (positioning is None or positioning[i])
         )
+        requirements[name] = PartRequirement(
+            value=satisfied == rule.count if rule.exact else satisfied >= rule.count,
+            count=len(bricks),
+            alignment=alignment if rule.aligned else None,
+            positioning=positioning
+        )
+    return requirements
 
-def is_wheel_aligned(design: Design):
-    return [
-            brick.is_aligned(design)
-            for brick in design.bricks
-            if brick.bl_id == "30027bc01"
-        ]
+def get_requirements_analysis_reference(design: Design):
+    """
+    Get the requirements analysis for a design with part rules evaluated
+    brick by brick and connected components counted on the exact
+    sweep-and-prune adjacency (see `engines`).
 
-def is_wheel_on_bottom(design: Design):
-    return [
-            bool(design.is_close_to_axis(
-                brick,
-                np.negative(design.get_top_axis())
-            ))
-            for brick in design.bricks
-            if brick.bl_id == "30027bc01"
-        ]
+    Args:
+        design (`:obj:Design`): the design to analyze.
 
-def is_min_four_wheels_aligned_on_bottom(design: Design):
-    return bool(
-            sum(
-                np.logical_and(
-                    is_wheel_aligned(design),
-                    is_wheel_on_bottom(design)
-                )
-            ) >= 4
-        )
+    Returns:
+        `:obj:RequirementsAnalysis`: the requirements analysis.
+    """
+    return get_requirements_analysis(
+        design,
+        evaluate_part_rules_reference(design, PART_RULES),
+        count_components_reference(design)
+    )
 
-def count_headlights(design: Design):
-    return sum(
-            (brick.bl_id == "54200" or brick.bl_id == "98138") and brick.bl_color == 12
-            for brick in design.bricks
-        )
+def count_components_reference(design: Design):
+    """
+    Counts the connected components of a design from its exact adjacency,
+    independent of the spatial index and union-find (see `count_components`).
 
-def is_headlight_aligned(design: Design):
-    return [
-            brick.is_aligned(design)
-            for brick in design.bricks
-            if (brick.bl_id == "54200" or brick.bl_id == "98138") and brick.bl_color == 12
-        ]
+    Args:
+        design (`:obj:Design`): the design to analyze.
 
-def is_headlight_on_front(design: Design):
-    return [
-            bool(design.is_close_to_axis(
-                brick,
-                design.get_forward_axis()
-            ))
-            for brick in design.bricks
-            if (brick.bl_id == "54200" or brick.bl_id == "98138") and brick.bl_color == 12
-        ]
+    Returns:
+        int: the number of connected components.
+    """
+    adjacency = design.get_valid_bricks().get_adjacency()
+    return int(csgraph.connected_components(adjacency, directed=False)[0])
 
-def is_min_two_headlights_aligned_on_front(design: Design):
-    return bool(
-            sum(
-                np.logical_and(
-                    is_headlight_aligned(design),
-                    is_headlight_on_front(design)
-                )
-            ) >= 2
-        )
+@metric
+def get_part_requirements(design: Design):
+    return evaluate_part_rules(design, PART_RULES)
 
-def count_taillights(design: Design):
-    return sum(
-            (brick.bl_id == "54200" or brick.bl_id == "98138") and brick.bl_color == 17
-            for brick in design.bricks
-        )
+@metric
+def is_only_valid_bricks(design: Design):
+    return len(get_invalid_bricks(design)) == 0
 
-def is_taillight_aligned(design: Design):
-    return [
-            brick.is_aligned(design)
-            for brick in design.bricks
-            if (brick.bl_id == "54200" or brick.bl_id == "98138") and brick.bl_color == 17
-        ]
+@metric
+def get_invalid_bricks(design: Design):
+    return design.get_invalid_bricks().bl_id.tolist()
 
-def is_taillight_on_back(design: Design):
-    return [
-            bool(design.is_close_to_axis(
-                brick,
-                np.negative(design.get_forward_axis())
-            ))
-            for brick in design.bricks
-            if (brick.bl_id == "54200" or brick.bl_id == "98138") and brick.bl_color == 17
-        ]
+@metric
+def is_fully_connected(design: Design):
+    return count_components(design) == 1
 
-def is_min_two_taillights_aligned_on_back(design: Design):
-    return bool(
-            sum(
-                np.logical_and(
-                    is_taillight_aligned(design),
-                    is_taillight_on_back(design)
-                )
-            ) >= 2
-        )
+@metric
+def count_components(design: Design):
+    return design.get_num_components()
 
-def count_license_plates(design: Design):
-    return sum(
-            (brick.bl_id == "3069b") and brick.bl_color == 3
-            for brick in design.bricks
-        )
+@metric
+def get_requirements_approximate_fields(design: Design):
+    # (missing intersecting pairs can split connected bricks)
+    return ["is_fully_connected", "is_valid"] if design.is_overlap_partial() else []
 
-def is_license_plate_aligned(design: Design):
-    return [
-            brick.is_aligned(design)
-            for brick in design.bricks
-            if (brick.bl_id == "3069b") and brick.bl_color == 3
-        ]
+@metric
+def count_cargo_holds(design: Design):
+    return int(np.sum(design.bricks.bl_id == "4345"))
 
-def is_license_plate_on_back(design: Design):
-    return [
-            bool(design.is_close_to_axis(
-                brick,
-                np.negative(design.get_forward_axis())
-            ))
-            for brick in design.bricks
-            if (brick.bl_id == "3069b") and brick.bl_color == 3
-        ]
+def is_valid(design: Design, part_requirements=None, num_components=None):
+    """
+    Determines whether a design meets all requirements.
 
-def is_one_license_plate_aligned_on_back(design: Design):
-    return bool(
-            sum(
-                np.logical_and(
-                    is_license_plate_aligned(design),
-                    is_license_plate_on_back(design)
-                )
-            ) == 1
-        )
+    Args:
+        design (`:obj:Design`): the design.
+        part_requirements (Dict[str, `:obj:PartRequirement`]): the evaluated
+            part rules (see `evaluate_part_rules`), if already evaluated.
+        num_components (int): the number of connected components, if
+            already counted.
 
-def is_valid(design: Design):
+    Returns:
+        bool: True, if the design meets all requirements.
+    """
+    if part_requirements is None:
+        part_requirements = get_part_requirements(design)
     return all([
             is_only_valid_bricks(design),
-            is_fully_connected(design),
-            is_one_steering_wheel(design),
-            is_min_one_seat_aligned(design),
-            is_min_four_wheels_aligned_on_bottom(design),
-            is_min_two_headlights_aligned_on_front(design),
-            is_min_two_taillights_aligned_on_back(design),
-            is_one_license_plate_aligned_on_back(design)
+            is_fully_connected(design) if num_components is None else num_components == 1
+        ] + [
+            requirement.value
+            for requirement in part_requirements.values()
         ])
@@ -0,0 +1,213 @@
+import functools
+import json
+
+import numpy as np
+
+from .cost import COST_PARAMETERS, get_total_cost
+from .value import (
+    VALUE_PARAMETERS,
+    get_passenger_value,
+    get_cargo_value,
+    get_handling_value,
+    get_acceleration_value,
+    get_safety_value,
+    get_coolness_value,
+    get_total_value,
+    get_price
+)
+
+# maximum number of designs with memoized stored inputs
+TRADESPACE_CACHE_SIZE = 16384
+
+# design inputs of the value model (see `ValueInputs`)
+VALUE_INPUTS = (
+    "num_seats",
+    "volume",
+    "cargo_volume",
+    "mass",
+    "wheelbase",
+    "height",
+    "safety",
+    "coolness"
+)
+
+def get_requirement_values(requirements):
+    """
+    Get the value of each requirement of a stored requirements analysis.
+
+    Args:
+        requirements (dict): the requirements analysis (parsed JSON).
+
+    Returns:
+        Dict[str, bool]: the requirement values by name.
+    """
+    values = {
+        name: requirement["value"]
+        for name, requirement in requirements.items()
+        if isinstance(requirement, dict) and "value" in requirement
+    }
+    values.update(
+        (name, requirement["value"])
+        for name, requirement in requirements.get("additional_requirements", {}).items()
+    )
+    return values
+
+@functools.lru_cache(maxsize=TRADESPACE_CACHE_SIZE)
+def get_stored_inputs(requirements_json, cost_json, value_json):
+    """
+    Get the model inputs from the stored analyses of a design, memoized on
+    the stored JSON so unchanged designs are only parsed once.
+
+    Args:
+        requirements_json (str): the requirements analysis (JSON).
+        cost_json (str): the cost analysis (JSON).
+        value_json (str): the value analysis (JSON).
+
+    Returns:
+        (Dict[str, bool], float, float, dict): the requirement values, the
+            materials and assembly costs and the value model inputs, or None
+            if analyzed before the value model inputs were stored.
+    """
+    inputs = json.loads(value_json).get("inputs")
+    if inputs is None:
+        return None
+    cost = json.loads(cost_json)
+    return (
+        get_requirement_values(json.loads(requirements_json)),
+        cost["materials"],
+        cost["assembly"]["total"],
+        inputs
+    )
+
+class Tradespace(object):
+    """
+    Stored inputs of the cost and value models for a set of designs as arrays,
+    so alternative model parameters re-evaluate all designs at once.
+    """
+    def __init__(self, design_ids, materials, assembly, value_inputs, requirements):
+        """
+        Initializes this tradespace.
+
+        Args:
+            design_ids (List[str]): the design identifiers.
+            materials (`:obj:array`): the materials cost of each design ($).
+            assembly (`:obj:array`): the assembly cost of each design ($).
+            value_inputs (Dict[str, `:obj:array`]): the value model inputs
+                of each design (see `VALUE_INPUTS`).
+            requirements (Dict[str, `:obj:array`]): whether each design meets
+                each requirement.
+        """
+        self.design_ids = list(design_ids)
+        self.materials = np.asarray(materials, dtype=float)
+        self.assembly = np.asarray(assembly, dtype=float)
+        self.value_inputs = {
+            name: np.asarray(value_inputs[name], dtype=float)
+            for name in VALUE_INPUTS
+        }
+        self.requirements = {
+            name: np.asarray(values, dtype=bool)
+            for name, values in requirements.items()
+        }
+
+    @classmethod
+    def from_stored(cls, designs):
+        """
+        Collects a tradespace from stored analyses. Designs analyzed before
+        the value model inputs were stored are skipped.
+
+        Args:
+            designs (iterable): the design identifier and the stored
+                requirements, cost and value analysis (JSON) of each design.
+
+        Returns:
+            (`:obj:Tradespace`, List[str]): the tradespace and the identifiers
+                of the skipped designs.
+        """
+        design_ids = []
+        skipped = []
+        rows = []
+        for design_id, requirements_json, cost_json, value_json in designs:
+            row = get_stored_inputs(requirements_json, cost_json, value_json)
+            if row is None:
+                skipped.append(design_id)
+            else:
+                design_ids.append(design_id)
+                rows.append(row)
+        names = sorted(set(name for row in rows for name in row[0]))
+        return cls(
+            design_ids,
+            [materials for values, materials, assembly, inputs in rows],
+            [assembly for values, materials, assembly, inputs in rows],
+            {
+                name: [inputs[name] for values, materials, assembly, inputs in rows]
+                for name in VALUE_INPUTS
+            },
+            {
+                # designs analyzed without a requirement do not meet it
+                name: [values.get(name, False) for values, materials, assembly, inputs in rows]
+                for name in names
+            }
+        ), skipped
+
+    def __len__(self):
+        return len(self.design_ids)
+
+    def evaluate(self, cost_parameters=COST_PARAMETERS, value_parameters=VALUE_PARAMETERS, requirements=None):
+        """
+        Evaluates all designs under alternative model parameters.
+
+        Args:
+            cost_parameters (`:obj:CostParameters`): the cost model parameters.
+            value_parameters (`:obj:ValueParameters`): the value model parameters.
+            requirements (List[str]): the requirements for a valid design
+                (all, if None).
+
+        Returns:
+            Dict[str, `:obj:array`]: the validity, total cost, total revenue
+                (price), total profit and total ROI (NaN if the total cost is
+                not positive) of each design.
+        """
+        inputs = self.value_inputs
+        total_value = get_total_value(
+            get_passenger_value(inputs["num_seats"], inputs["volume"], value_parameters),
+            get_cargo_value(inputs["cargo_volume"], inputs["volume"], value_parameters),
+            get_handling_value(inputs["mass"], inputs["wheelbase"], value_parameters),
+            get_acceleration_value(inputs["mass"], inputs["height"], value_parameters),
+            get_safety_value(inputs["mass"], inputs["safety"], value_parameters),
+            get_coolness_value(inputs["coolness"], value_parameters),
+            value_parameters
+        )
+        total_revenue = get_price(total_value, value_parameters)
+        total_cost = get_total_cost(self.materials, self.assembly, cost_parameters)
+        is_valid = np.ones(len(self), dtype=bool)
+        for name in (self.requirements if requirements is None else requirements):
+            is_valid &= self.requirements.get(name, np.zeros(len(self), dtype=bool))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            total_roi = np.where(
+                total_cost > 0,
+                (total_revenue - total_cost)/total_cost,
+                np.nan
+            )
+        return {
+            "is_valid": is_valid,
+            "total_cost": total_cost,
+            "total_revenue": total_revenue,
+            "total_profit": total_revenue - total_cost,
+            "total_roi": total_roi
+        }
+
+def get_ranking(results, rank_by="total_profit"):
+    """
+    Get the order of designs with valid designs first, then by a result
+    (descending, except ascending for total cost).
+
+    Args:
+        results (Dict[str, `:obj:array`]): the results (see `Tradespace.evaluate`).
+        rank_by (str): the result by which to rank designs.
+
+    Returns:
+        `:obj:array`: the design indices in rank order.
+    """
+    key = results[rank_by] if rank_by == "total_cost" else -results[rank_by]
+    # (undefined results, NaN, sort last)
+    return np.lexsort((key, ~results["is_valid"]))
@@ -0,0 +1,146 @@
+from collections import namedtuple
+import os
+
+import numpy as np
+from scipy import linalg, sparse
+from scipy.sparse import csgraph
+
+# matrices (and connected components) up to this size are decomposed densely
+DENSE_LIMIT = int(os.getenv("ISE_SPECTRAL_DENSE_LIMIT", 2000))
+
+# stochastic Lanczos quadrature settings for larger components
+NUM_PROBES = 16
+NUM_STEPS = 60
+
+# z-score of the reported error bound (95% confidence)
+ERROR_Z = 1.96
+
+SpectralEstimate = namedtuple("SpectralEstimate", ["value", "error"])
+SpectralEstimate.__doc__ = """
+Spectral quantity with an error bound (0 if computed exactly).
+"""
+
+def _is_symmetric(matrix):
+    """
+    Determines whether a (dense or sparse) square matrix is symmetric.
+    """
+    if sparse.issparse(matrix):
+        return (matrix != matrix.T).nnz == 0
+    return np.array_equal(matrix, np.transpose(matrix))
+
+def _get_lanczos_estimate(matrix, probes, steps, rng):
+    """
+    Estimates the sum of absolute eigenvalues of a symmetric matrix with
+    stochastic Lanczos quadrature (Hutchinson trace estimation of |A|).
+
+    Args:
+        matrix (`:obj:csr_matrix`): the symmetric matrix.
+        probes (int): the number of random probe vectors.
+        steps (int): the number of Lanczos steps per probe.
+        rng (`:obj:Generator`): the random number generator.
+
+    Returns:
+        `:obj:SpectralEstimate`: the estimate and its error bound.
+    """
+    n = matrix.shape[0]
+    steps = min(steps, n)
+    samples = []
+    for _ in range(probes):
+        # Rademacher probe, normalized (|z|^2 = n)
+        basis = np.zeros((steps, n))
+        basis[0] = rng.choice([-1.0, 1.0], size=n)/np.sqrt(n)
+        alpha = np.zeros(steps)
+        beta = np.zeros(steps - 1)
+        size = steps
+        for j in range(steps):
+            w = matrix @ basis[j]
+            alpha[j] = np.dot(w, basis[j])
+            # full reorthogonalization against the basis so far
+            w -= basis[:j+1].T @ (basis[:j+1] @ w)
+            if j + 1 < steps:
+                beta[j] = np.linalg.norm(w)
+                if beta[j] < 1e-10:
+                    # invariant subspace found: the quadrature is exact
+                    size = j + 1
+                    break
+                basis[j+1] = w/beta[j]
+        nodes, vectors = linalg.eigh_tridiagonal(
+            alpha[:size], beta[:size-1]
+        )
+        samples.append(n*np.sum(vectors[0]**2*np.abs(nodes)))
+    return SpectralEstimate(
+        float(np.mean(samples)),
+        float(ERROR_Z*np.std(samples, ddof=1)/np.sqrt(probes)) if probes > 1 else float('inf')
+    )
+
+def _get_absolute_eigenvalue_sum(matrix, dense_limit, probes, steps, seed):
+    """
+    Gets the sum of absolute eigenvalues of a sparse symmetric matrix by
+    decomposing each connected component (block) separately: densely up to
+    the size limit and with stochastic Lanczos quadrature above it.
+    """
+    num_components, labels = csgraph.connected_components(matrix, directed=False)
+    order = np.argsort(labels, kind="stable")
+    bounds = np.searchsorted(labels[order], np.arange(num_components + 1))
+    rng = np.random.default_rng(seed)
+    value = 0.0
+    error = 0.0
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        members = order[start:end]
+        block = matrix[members][:, members]
+        if len(members) <= dense_limit:
+            value += np.sum(np.abs(linalg.eigvalsh(block.toarray())))
+        else:
+            estimate = _get_lanczos_estimate(block, probes, steps, rng)
+            value += estimate.value
+            error += estimate.error
+    return SpectralEstimate(float(value), float(error))
+
+def get_nuclear_norm(matrix, dense_limit=DENSE_LIMIT, probes=NUM_PROBES, steps=NUM_STEPS, seed=0):
+    """
+    Gets the nuclear norm (sum of singular values) of a matrix.
+
+    Matrices up to the size limit (or not symmetric) use a dense singular value
+    decomposition. Larger symmetric matrices (e.g., a DSM) use the absolute
+    eigenvalues of each connected component instead.
+
+    Args:
+        matrix (`:obj:array` or `:obj:spmatrix`): the square matrix.
+        dense_limit (int): the maximum size for dense decomposition.
+        probes (int): the number of probe vectors for estimated components.
+        steps (int): the number of Lanczos steps for estimated components.
+        seed (int): the random seed for estimated components.
+
+    Returns:
+        `:obj:SpectralEstimate`: the nuclear norm and its error bound.
+    """
+    if matrix.shape[0] <= dense_limit or not _is_symmetric(matrix):
+        if sparse.issparse(matrix):
+            matrix = matrix.toarray()
+        return SpectralEstimate(np.sum(linalg.svd(matrix)[1]), 0.0)
+    return _get_absolute_eigenvalue_sum(
+        sparse.csr_matrix(matrix, dtype=float), dense_limit, probes, steps, seed
+    )
+
+def get_graph_energy(matrix, dense_limit=DENSE_LIMIT, probes=NUM_PROBES, steps=NUM_STEPS, seed=0):
+    """
+    Gets the graph energy (sum of absolute eigenvalues) of a symmetric
+    adjacency matrix less the identity (A - I), as a DSM includes each brick
+    with itself.
+
+    Args:
+        matrix (`:obj:array` or `:obj:spmatrix`): the symmetric matrix.
+        dense_limit (int): the maximum size for dense decomposition.
+        probes (int): the number of probe vectors for estimated components.
+        steps (int): the number of Lanczos steps for estimated components.
+        seed (int): the random seed for estimated components.
+
+    Returns:
+        `:obj:SpectralEstimate`: the graph energy and its error bound.
+    """
+    shifted = sparse.csr_matrix(matrix, dtype=float) - sparse.identity(matrix.shape[0], format="csr")
+    if matrix.shape[0] <= dense_limit:
+        return SpectralEstimate(
+            float(np.sum(np.abs(linalg.eigvalsh(shifted.toarray())))), 0.0
+        )
+    return _get_absolute_eigenvalue_sum(shifted, dense_limit, probes, steps, seed)
@@ -1,47 +1,73 @@
 from base64 import b64encode
 import hashlib
 from humanhash import humanize
-import json
+from io import BytesIO
 import numpy as np
-from pkg_resources import resource_stream
-from PIL import Image
+from PIL import Image, ImageOps
 import re
-from xml.etree import ElementTree
 
-from ..schemas.brick import Brick
+from ..schemas.brick import Brick, BrickArray
+from .catalog import BRICK_DATA, VALID_BL_IDS, CATALOG
 
-with open(resource_stream(__name__, '../../resources/bricks.json').name, 'r') as data:
-    BRICK_DATA = json.load(data)
+# fixed size of the preview image (pixels)
+PREVIEW_SIZE = (160, 120)
 
-VALID_BL_IDS = []
-with open(resource_stream(__name__, '../../resources/ISE_Palette.xml').name, 'rb') as xml:
-    tree = ElementTree.parse(xml)
-    for item in tree.getroot().iter('ITEM'):
-        bl_id = item.find('ITEMID').text
-        VALID_BL_IDS.append(bl_id)
-    VALID_BL_IDS.append("4345b") # fix BrickLink error (mislabled brick)
+# maximum size of the detail image (pixels)
+DETAIL_SIZE = (640, 480)
 
-def crop_image(thumb_path):
+# encoding format and quality of the preview and detail images
+THUMBNAIL_FORMAT = "WEBP"
+THUMBNAIL_QUALITY = 80
+
+def _encode_image(image):
+    """
+    Encodes an image in the thumbnail format.
+
+    Returns:
+        bytes: the encoded image.
+    """
+    with BytesIO() as image_fp:
+        image.save(image_fp, format=THUMBNAIL_FORMAT, quality=THUMBNAIL_QUALITY, method=4)
+        return image_fp.getvalue()
+
+def get_thumbnails(thumb_data):
     """
-    Crops an image to the smallest non-empty rectangular bounding box.
+    Gets the preview and detail images for a thumbnail. The thumbnail is
+    cropped to the bounding box of its alpha channel (without converting
+    the full image to an array) before downscaling and encoding.
 
     Args:
-        thumb_path (str): path to the image file to be cropped.
-    """
-    image = Image.open(thumb_path)
-    # image.crop(image.getbbox()).save(filename)
-    image.load()
-    image_data = np.asarray(image)
-    image_data_bw = image_data.max(axis=2)
-    non_empty_columns = np.where(image_data_bw.max(axis=0) > 0)[0]
-    non_empty_rows = np.where(image_data_bw.max(axis=1) > 0)[0]
-    if len(non_empty_columns) == 0 or len(non_empty_rows) == 0:
-        cropBox = (0, 0, 0, 0)
-    else:
-        cropBox = (min(non_empty_rows), max(non_empty_rows), min(non_empty_columns), max(non_empty_columns))
-    image_data_new = image_data[cropBox[0]:cropBox[1]+1, cropBox[2]:cropBox[3]+1 , :]
-    new_image = Image.fromarray(image_data_new)
-    new_image.save(thumb_path)
+        thumb_data (bytes): the thumbnail (PNG) contents.
+
+    Returns:
+        dict: the `thumbnail` (fixed-size preview) and `thumbnail_detail`
+            images in base64 encoding and their encoded sizes (bytes).
+    """
+    with BytesIO(thumb_data) as thumb_fp:
+        image = Image.open(thumb_fp)
+        image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+    bbox = (
+        image.getchannel("A").getbbox()
+        if "A" in image.getbands()
+        else image.getbbox()
+    )
+    if bbox is not None:
+        image = image.crop(bbox)
+    image.thumbnail(DETAIL_SIZE, Image.LANCZOS)
+    preview = ImageOps.pad(
+        image, PREVIEW_SIZE, Image.LANCZOS,
+        color=(0, 0, 0, 0) if image.mode == "RGBA" else (255, 255, 255)
+    )
+    preview_data = _encode_image(preview)
+    detail_data = _encode_image(image)
+    return {
+        "thumbnail": b64encode(preview_data).decode('utf-8'),
+        "thumbnail_size": len(preview_data),
+        "thumbnail_detail": b64encode(detail_data).decode('utf-8'),
+        "thumbnail_detail_size": len(detail_data)
+    }
 
 def get_design_id(ldr_path):
     """
@@ -72,7 +98,20 @@ def get_design_name(ldr_path, words=2):
     Returns:
         str: the design name
     """
-    return humanize(get_design_id(ldr_path), words=2, separator=' ')
+    return humanize_design_id(get_design_id(ldr_path), words=words)
+
+def humanize_design_id(design_id, words=2):
+    """
+    Gets a unique design name for a design identifier.
+
+    Args:
+        design_id (str): the design identifier (hexadecimal digest).
+        words (int): number of words in the name.
+
+    Returns:
+        str: the design name
+    """
+    return humanize(design_id, words=words, separator=' ')
 
 def get_thumbnail(thumb_path):
     """
@@ -86,21 +125,70 @@ def get_brick_data(bl_id, ld_color=None):
     """
     Get the data for a brick.
     """
-    for data in BRICK_DATA:
-        if ((ld_color is None and data["bl_id"] == bl_id)
-                or (ld_color is not None
-                    and data["bl_id"] == bl_id
-                    and data["ld_color"] == ld_color)):
-            return data
-    return None
+    return CATALOG.get_data(bl_id, ld_color, fallback=False)
+
+# LDraw type-1 (sub-file reference) lines with a color, 12 transformation
+# elements and a file name (part or submodel, which may contain spaces)
+LDR_REFERENCE_PATTERN = re.compile(
+    r"^[ \t]*1[ \t]+(\S+)((?:[ \t]+\S+){12})[ \t]+(\S.*?)[ \t\r]*$",
+    re.MULTILINE
+)
+
+# LDraw part file names
+LDR_PART_PATTERN = re.compile(r"^(\w+)\.dat$")
+
+# LDraw multi-part document (MPD) section meta-commands
+LDR_FILE_PATTERN = re.compile(
+    r"^[ \t]*0[ \t]+(FILE|NOFILE)\b[ \t]*(.*?)[ \t\r]*$",
+    re.MULTILINE
+)
+
+# LDraw color inherited from the referencing line
+LDR_MAIN_COLOR = 16
+
+# tolerance of orthonormal LDraw rotations (written with few decimals)
+LDR_ROTATION_TOLERANCE = 1e-3
+
+def _get_brick(bl_id, ld_color, position, rotation, index, vertices):
+    """
+    Build a brick from its parsed LDraw elements and catalog record index.
+    """
+    if index is None or index < 0:
+        return Brick(
+            bl_id = bl_id,
+            ld_color = ld_color,
+            position = position,
+            rotation = rotation
+        )
+    data = CATALOG.records[index]
+    return Brick(
+        bl_id = bl_id,
+        ld_color = ld_color,
+        position = position,
+        rotation = rotation,
+        id = data.get("id", None),
+        name = data.get("name", None),
+        cost = data.get("cost", 0),
+        mass = data.get("mass", 0),
+        safety = data.get("safety", 0),
+        coolness = data.get("coolness", 0),
+        volume = CATALOG.get_volume(index),
+        valid_forward_axes = data.get("valid_forward_axes", None),
+        bl_color = data.get("bl_color", None),
+        is_valid = CATALOG.is_valid(bl_id),
+        vertices = vertices
+    )
 
 def _parse_brick(ldr_line):
     """
     Parse a brick from a LDraw line.
     """
     elements = ldr_line.split()
-    if len(elements) == 15 and elements[0] == "1" and re.match(r"^(\w+)\.dat$", elements[14]):
-        bl_id = re.match(r"^(\w+)\.dat$", elements[14]).group(1)
+    if len(elements) == 15 and elements[0] == "1":
+        match = re.match(r"^(\w+)\.dat$", elements[14])
+        if match is None:
+            return None
+        bl_id = match.group(1)
         ld_color = int(elements[1])
         position = [float(elements[2]), float(elements[3]), float(elements[4])]
         rotation = [
@@ -108,63 +196,260 @@ def _parse_brick(ldr_line):
             [float(elements[8]), float(elements[9]), float(elements[10])],
             [float(elements[11]), float(elements[12]), float(elements[13])]
         ]
-        data = get_brick_data(bl_id, ld_color)
-        if data is None:
-            # fall back to color-less version
-            data = get_brick_data(bl_id)
-        if data is None:
-            return Brick(
-                bl_id = bl_id,
-                ld_color = ld_color,
-                position = position,
-                rotation = rotation
-            )
-
-        lower = np.array(data.get("offset", [0,0,0]))
-        upper = lower - np.array(data.get("dimensions", [0,0,0]))
-        raw_vertices = np.array([
-            [lower[0],   lower[1],    lower[2]],
-            [upper[0],   lower[1],    lower[2]],
-            [upper[0],   upper[1],    lower[2]],
-            [upper[0],   upper[1],    upper[2]],
-            [upper[0],   lower[1],    upper[2]],
-            [lower[0],   lower[1],    upper[2]],
-            [lower[0],   upper[1],    upper[2]],
-            [lower[0],   upper[1],    lower[2]],
-        ])
-        vertices = np.around(
-            np.matmul(
-                raw_vertices,
-                np.array(rotation).transpose()
-            ) + np.array(position)
-        )
-        return Brick(
-            bl_id = bl_id,
-            ld_color = ld_color,
-            position = position,
-            rotation = rotation,
-            id = data.get("id", None),
-            name = data.get("name", None),
-            cost = data.get("cost", 0),
-            mass = data.get("mass", 0),
-            safety = data.get("safety", 0),
-            coolness = data.get("coolness", 0),
-            volume = np.product(data.get("dimensions", [0,0,0])),
-            valid_forward_axes = data.get("valid_forward_axes", None),
-            bl_color = data.get("bl_color", None),
-            is_valid = bl_id in VALID_BL_IDS,
-            vertices = vertices.tolist()
+        # look up the brick data (falls back to color-less version)
+        index = CATALOG.get_index(bl_id, ld_color)
+        return _get_brick(
+            bl_id, ld_color, position, rotation, index,
+            CATALOG.get_vertices(index, rotation, position).tolist()
+            if index is not None else None
         )
     return None
 
+def _get_ldr_sections(ldr_text):
+    """
+    Splits LDraw text into its multi-part document (MPD) sections.
+
+    Args:
+        ldr_text (str): the LDraw file contents.
+
+    Returns:
+        (str, dict): the main section name and the section contents keyed by
+            lower-case name (a file without sections is the main section).
+    """
+    matches = list(LDR_FILE_PATTERN.finditer(ldr_text))
+    if not any(match.group(1) == "FILE" for match in matches):
+        return None, {None: ldr_text}
+    sections = {}
+    for i, match in enumerate(matches):
+        if match.group(1) == "FILE":
+            end = matches[i+1].start() if i+1 < len(matches) else len(ldr_text)
+            # first section with a name wins, consistent with LDraw viewers
+            sections.setdefault(
+                match.group(2).lower(),
+                ldr_text[match.end():end]
+            )
+    main = next(match for match in matches if match.group(1) == "FILE")
+    return main.group(2).lower(), sections
+
+class TooManyBricks(ValueError):
+    """
+    Raised when an LDraw file expands to more than the maximum number of bricks.
+    """
+    pass
+
+def _count_ldr_section(name, sections, references, counts, parents=()):
+    """
+    Counts the bricks of an LDraw section (expanding submodel references
+    recursively) without building any arrays, so nested submodels that expand
+    to too many bricks are found before flattening.
+
+    Args:
+        name (str): the section name.
+        sections (dict): the section contents keyed by lower-case name.
+        references (dict): the reference lines (see `LDR_REFERENCE_PATTERN`)
+            keyed by section name, filled in while counting.
+        counts (dict): the brick counts keyed by section name.
+        parents (tuple): the names of the referencing sections.
+
+    Returns:
+        int: the number of bricks.
+    """
+    if name in counts:
+        return counts[name]
+    if name in parents:
+        raise ValueError("Recursive LDraw submodel reference: {}.".format(name))
+    references[name] = LDR_REFERENCE_PATTERN.findall(sections[name])
+    count = 0
+    for match in references[name]:
+        reference = match[2].lower()
+        if reference in sections:
+            count += _count_ldr_section(reference, sections, references, counts, parents + (name,))
+        elif LDR_PART_PATTERN.match(match[2]) is not None:
+            count += 1
+    counts[name] = count
+    return count
+
+def _flatten_ldr_section(name, sections, memo, parents=(), references=None):
+    """
+    Flattens the bricks of an LDraw section (expanding submodel references
+    recursively) into arrays in the section's coordinate frame. Flattened
+    submodels are memoized and all instances of a submodel are transformed
+    together with one batched matmul.
+
+    Args:
+        name (str): the section name.
+        sections (dict): the section contents keyed by lower-case name.
+        memo (dict): the flattened sections keyed by name.
+        parents (tuple): the names of the referencing sections.
+        references (dict): the reference lines keyed by section name, if
+            already found (see `_count_ldr_section`).
+
+    Returns:
+        dict: arrays with keys `bl_id` (N), `ld_color` (N), `position` (Nx3)
+            and `rotation` (Nx3x3).
+    """
+    if name in memo:
+        return memo[name]
+    if name in parents:
+        raise ValueError("Recursive LDraw submodel reference: {}.".format(name))
+    matches = (
+        references[name] if references is not None and name in references
+        else LDR_REFERENCE_PATTERN.findall(sections[name])
+    )
+    numbers = np.fromstring(
+        " ".join(match[1] for match in matches),
+        dtype=float,
+        sep=" "
+    )
+    if numbers.size != 12*len(matches):
+        raise ValueError("Could not parse LDraw brick transformations.")
+    numbers = numbers.reshape(-1, 12)
+    ld_colors = np.array([int(match[0]) for match in matches], dtype=np.int64)
+    positions = numbers[:, 0:3]
+    rotations = numbers[:, 3:12].reshape(-1, 3, 3)
+    # reject scaled or sheared transformations (bricks and submodels are rigid)
+    if not np.allclose(
+        np.matmul(rotations, np.transpose(rotations, (0, 2, 1))),
+        np.eye(3),
+        rtol=0,
+        atol=LDR_ROTATION_TOLERANCE
+    ):
+        raise ValueError("Could not parse LDraw brick transformations (not orthonormal).")
+    # sort references into parts and submodel instances (by submodel)
+    parts = []
+    instances = {}
+    for i, match in enumerate(matches):
+        reference = match[2].lower()
+        if reference in sections:
+            instances.setdefault(reference, []).append(i)
+        else:
+            part = LDR_PART_PATTERN.match(match[2])
+            if part is not None:
+                parts.append((i, part.group(1)))
+    lines = [np.array([i for i, bl_id in parts], dtype=np.int64)]
+    chunks = [{
+        "bl_id": np.array([bl_id for i, bl_id in parts], dtype=object),
+        "ld_color": ld_colors[lines[0]],
+        "position": positions[lines[0]],
+        "rotation": rotations[lines[0]]
+    }]
+    for reference, rows in instances.items():
+        child = _flatten_ldr_section(reference, sections, memo, parents + (name,), references)
+        rows = np.array(rows, dtype=np.int64)
+        # compose (K instances) x (M child bricks) transformations in bulk
+        child_colors = np.broadcast_to(child["ld_color"], (len(rows), len(child["ld_color"])))
+        lines.append(np.repeat(rows, len(child["ld_color"])))
+        chunks.append({
+            "bl_id": np.tile(child["bl_id"], len(rows)),
+            "ld_color": np.where(
+                child_colors == LDR_MAIN_COLOR,
+                ld_colors[rows][:, np.newaxis],
+                child_colors
+            ).reshape(-1),
+            "position": (
+                np.matmul(
+                    child["position"][np.newaxis, :, :],
+                    np.transpose(rotations[rows], (0, 2, 1))
+                ) + positions[rows][:, np.newaxis, :]
+            ).reshape(-1, 3),
+            "rotation": np.matmul(
+                rotations[rows][:, np.newaxis, :, :],
+                child["rotation"][np.newaxis, :, :, :]
+            ).reshape(-1, 3, 3)
+        })
+    # restore the order of the referencing lines
+    order = np.argsort(np.concatenate(lines), kind="stable")
+    memo[name] = {
+        key: np.concatenate([chunk[key] for chunk in chunks])[order]
+        for key in ("bl_id", "ld_color", "position", "rotation")
+    }
+    return memo[name]
+
+def parse_ldr(ldr_text, max_bricks=None):
+    """
+    Parse all bricks from LDraw text into contiguous arrays in one pass,
+    expanding the submodels of multi-part documents (MPD).
+
+    Args:
+        ldr_text (str): the LDraw file contents.
+        max_bricks (int): the maximum number of bricks (after expanding
+            submodels), or None.
+
+    Returns:
+        dict: arrays with keys `bl_id` (N), `ld_color` (N), `index` (N catalog
+            record indices, -1 if undefined), `position` (Nx3), `rotation`
+            (Nx3x3) and `vertices` (Nx8x3, NaN if undefined).
+
+    Raises:
+        TooManyBricks: if the file expands to more than the maximum number of
+            bricks (checked before building any arrays).
+    """
+    main, sections = _get_ldr_sections(ldr_text.lstrip("\ufeff"))
+    references = {}
+    count = _count_ldr_section(main, sections, references, {})
+    if max_bricks is not None and count > max_bricks:
+        raise TooManyBricks("Design has more than {} bricks.".format(max_bricks))
+    arrays = dict(_flatten_ldr_section(main, sections, {}, references=references))
+    arrays["index"] = CATALOG.get_indices(arrays["bl_id"], arrays["ld_color"])
+    arrays["vertices"] = CATALOG.get_vertices_array(
+        arrays["index"], arrays["rotation"], arrays["position"]
+    )
+    return arrays
+
+def get_brick_arrays(ldr_path):
+    """
+    Get the bricks from a LDraw file path as contiguous arrays.
+    """
+    with open(ldr_path, 'r') as ldr_fp:
+        return parse_ldr(ldr_fp.read())
+
 def get_bricks(ldr_path):
     """
     Get the bricks from a LDraw file path.
     """
     with open(ldr_path, 'r') as ldr_fp:
-        return [
-            brick
-            for line in ldr_fp.readlines()
-            for brick in [_parse_brick(line)]
-            if brick is not None
-        ]
+        return parse_bricks(ldr_fp.read())
+
+def parse_bricks(ldr_text):
+    """
+    Parse the bricks from LDraw text.
+    """
+    return get_bricks_from_arrays(parse_ldr(ldr_text))
+
+def get_brick_array(arrays):
+    """
+    Get the columnar brick array from contiguous brick arrays (see
+    `parse_ldr`), gathering the brick attributes from the catalog.
+    """
+    return BrickArray(
+        bl_id=arrays["bl_id"],
+        ld_color=arrays["ld_color"],
+        position=arrays["position"],
+        rotation=arrays["rotation"],
+        vertices=arrays["vertices"],
+        is_defined=arrays["index"] >= 0,
+        **CATALOG.get_columns(arrays["index"])
+    )
+
+def get_bricks_from_arrays(arrays):
+    """
+    Get the bricks from contiguous brick arrays (see `parse_ldr`).
+    """
+    return [
+        _get_brick(
+            bl_id,
+            int(ld_color),
+            position,
+            rotation,
+            int(index),
+            vertices if index >= 0 else None
+        )
+        for bl_id, ld_color, index, position, rotation, vertices in zip(
+            arrays["bl_id"],
+            arrays["ld_color"],
+            arrays["index"],
+            arrays["position"].tolist(),
+            arrays["rotation"].tolist(),
+            arrays["vertices"].tolist()
+        )
+    ]
@@ -1,10 +1,14 @@
 import numpy as np
 import math
 
+from .metrics import metric
 from ..schemas.design import Design
-from ..schemas.value import ValueAnalysis
+from ..schemas.value import ValueAnalysis, ValueInputs, ValueParameters
 
-__version__ = "2.0.0"
+__version__ = "2.1.0"
+
+# default value model parameters
+VALUE_PARAMETERS = ValueParameters()
 
 def get_value_analysis(design: Design):
     """
@@ -26,104 +30,158 @@ def get_value_analysis(design: Design):
         coolness=get_value_coolness(design),
         total=get_value_total(design),
         price=get_value_price(design),
+        inputs=get_value_inputs(design)
+    )
+
+def get_value_analysis_reference(design: Design):
+    """
+    Get the value analysis for a design with the reference per-brick methods
+    (see `engines`).
+
+    Args:
+        design (`:obj:Design`): the design to analyze.
+
+    Returns:
+        `:obj:ValueAnalysis`: the value analysis.
+    """
+    valid_bricks = list(design.get_valid_bricks())
+    inputs = ValueInputs(
+        num_seats=sum(1 for brick in valid_bricks if brick.bl_id == "4079b"),
+        volume=design.get_volume()/1000*0.4**3,
+        cargo_volume=sum(
+            brick.volume/1000*0.4**3
+            for brick in valid_bricks
+            if brick.bl_id == "4345" or brick.bl_id == "4345b"
+        ),
+        mass=design.get_mass(),
+        wheelbase=design.get_wheelbase()*0.4,
+        height=design.get_height()*0.4,
+        safety=sum(
+            brick.safety if brick.is_aligned(design) else 0
+            for brick in valid_bricks
+        ),
+        coolness=sum(brick.coolness for brick in valid_bricks)
+    )
+    passenger = get_passenger_value(inputs.num_seats, inputs.volume)
+    cargo = get_cargo_value(inputs.cargo_volume, inputs.volume)
+    handling = get_handling_value(inputs.mass, inputs.wheelbase)
+    acceleration = get_acceleration_value(inputs.mass, inputs.height)
+    safety = get_safety_value(inputs.mass, inputs.safety)
+    coolness = get_coolness_value(inputs.coolness)
+    total = get_total_value(passenger, cargo, handling, acceleration, safety, coolness)
+    return ValueAnalysis(
+        version=__version__,
+        passenger=passenger,
+        cargo=cargo,
+        handling=handling,
+        acceleration=acceleration,
+        safety=safety,
+        coolness=coolness,
+        total=total,
+        price=get_price(total),
+        inputs=inputs
     )
 
 def get_logistic_transform(point, min_value=0, max_value=1, midpoint=0, growth_rate=1):
+    if np.ndim(point) > 0:
+        # transform arrays elementwise
+        return min_value + (max_value-min_value)/(1+np.exp(-growth_rate*(np.asarray(point)-midpoint)))
     return min_value + (max_value-min_value)/(1+math.exp(-growth_rate*(point-midpoint)))
 
-def get_value_passenger_capacity(design: Design):
-    volume = design.get_volume()/1000*0.4**3
-    num_seats = sum(
-        1 for brick in design.get_valid_bricks()
-        if brick.bl_id == "4079b"
-    )
-    return get_logistic_transform(
-        num_seats*50 + volume,
-        min_value=0,
-        max_value=100,
-        midpoint=200,
-        growth_rate=0.02
+# value model formulas (for single designs or arrays of designs)
+
+def get_passenger_value(num_seats, volume, parameters=VALUE_PARAMETERS):
+    return get_logistic_transform(num_seats*50 + volume, **parameters.passenger.dict())
+
+def get_cargo_value(cargo_volume, volume, parameters=VALUE_PARAMETERS):
+    return get_logistic_transform(cargo_volume*4 + volume, **parameters.cargo.dict())
+
+def get_handling_value(mass, wheelbase, parameters=VALUE_PARAMETERS):
+    return get_logistic_transform(mass + wheelbase, **parameters.handling.dict())
+
+def get_acceleration_value(mass, height, parameters=VALUE_PARAMETERS):
+    return get_logistic_transform(mass*5 + height, **parameters.acceleration.dict())
+
+def get_safety_value(mass, safety, parameters=VALUE_PARAMETERS):
+    return get_logistic_transform(mass*2 + safety, **parameters.safety.dict())
+
+def get_coolness_value(coolness, parameters=VALUE_PARAMETERS):
+    return get_logistic_transform(coolness, **parameters.coolness.dict())
+
+def get_total_value(passenger, cargo, handling, acceleration, safety, coolness, parameters=VALUE_PARAMETERS):
+    weights = parameters.weights
+    return (
+            weights.passenger*passenger
+            + weights.cargo*cargo
+            + weights.handling*handling
+            + weights.acceleration*acceleration
+            + weights.safety*safety
+            + weights.coolness*coolness
+        )
+
+def get_price(total, parameters=VALUE_PARAMETERS):
+    return get_logistic_transform(total, **parameters.price.dict())
+
+@metric
+def get_value_inputs(design: Design):
+    valid_bricks = design.get_valid_bricks()
+    return ValueInputs(
+        num_seats=int(np.sum(valid_bricks.bl_id == "4079b")),
+        volume=design.get_volume()/1000*0.4**3,
+        cargo_volume=sum((
+            valid_bricks.volume[np.isin(valid_bricks.bl_id, ["4345", "4345b"])]/1000*0.4**3
+        ).tolist()),
+        mass=design.get_mass(),
+        wheelbase=design.get_wheelbase()*0.4,
+        height=design.get_height()*0.4,
+        safety=sum(np.where(
+            design.get_alignment()[design.bricks.is_valid],
+            valid_bricks.safety,
+            0
+        ).tolist()),
+        coolness=sum(valid_bricks.coolness.tolist())
     )
 
+@metric
+def get_value_passenger_capacity(design: Design):
+    inputs = get_value_inputs(design)
+    return get_passenger_value(inputs.num_seats, inputs.volume)
+
+@metric
 def get_value_cargo_capacity(design: Design):
-    volume = design.get_volume()/1000*0.4**3
-    cargo_volume = sum(
-        brick.volume/1000*0.4**3
-        for brick in design.get_valid_bricks()
-        if brick.bl_id == "4345" or brick.bl_id == "4345b"
-    )
-    return get_logistic_transform(
-        cargo_volume*4 + volume,
-        min_value=0,
-        max_value=100,
-        midpoint=125,
-        growth_rate=0.03
-    )
+    inputs = get_value_inputs(design)
+    return get_cargo_value(inputs.cargo_volume, inputs.volume)
 
+@metric
 def get_value_handling(design: Design):
-    mass = design.get_mass()
-    wheelbase = design.get_wheelbase()*0.4
-    return get_logistic_transform(
-        mass + wheelbase,
-        min_value=100,
-        max_value=0,
-        midpoint=75,
-        growth_rate=0.075
-    )
+    inputs = get_value_inputs(design)
+    return get_handling_value(inputs.mass, inputs.wheelbase)
 
+@metric
 def get_value_acceleration(design: Design):
-    mass = design.get_mass()
-    height = design.get_height()*0.4
-    return get_logistic_transform(
-        mass*5 + height,
-        min_value=100,
-        max_value=0,
-        midpoint=160,
-        growth_rate=0.1
-    )
+    inputs = get_value_inputs(design)
+    return get_acceleration_value(inputs.mass, inputs.height)
 
+@metric
 def get_value_safety(design: Design):
-    mass = design.get_mass()
-    safety = sum(
-        brick.safety if brick.is_aligned(design) else 0
-        for brick in design.get_valid_bricks()
-    )
-    return get_logistic_transform(
-        mass*2 + safety,
-        min_value=0,
-        max_value=100,
-        midpoint=80,
-        growth_rate=0.04
-    )
+    inputs = get_value_inputs(design)
+    return get_safety_value(inputs.mass, inputs.safety)
 
+@metric
 def get_value_coolness(design: Design):
-    coolness = sum(
-        brick.coolness
-        for brick in design.get_valid_bricks()
-    )
-    return get_logistic_transform(
-        coolness,
-        min_value=0,
-        max_value=100,
-        midpoint=30,
-        growth_rate=0.09
-    )
+    return get_coolness_value(get_value_inputs(design).coolness)
 
+@metric
 def get_value_total(design: Design):
-    return (
-            0.2*get_value_passenger_capacity(design)
-            + 0.2*get_value_cargo_capacity(design)
-            + 0.1*get_value_handling(design)
-            + 0.15*get_value_acceleration(design)
-            + 0.15*get_value_safety(design)
-            + 0.2*get_value_coolness(design)
+    return get_total_value(
+            get_value_passenger_capacity(design),
+            get_value_cargo_capacity(design),
+            get_value_handling(design),
+            get_value_acceleration(design),
+            get_value_safety(design),
+            get_value_coolness(design)
         )
 
+@metric
 def get_value_price(design: Design):
-    return get_logistic_transform(
-            get_value_total(design),
-            min_value=2,
-            max_value=20,
-            midpoint=50,
-            growth_rate=0.1
-        )
+    return get_price(get_value_total(design))
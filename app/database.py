@@ -21,6 +21,26 @@ engine = sqlalchemy.create_engine(
 # create a session for route dependencies
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# function to add the columns missing from existing tables (`create_all` only
+# creates missing tables), e.g., in a database created by an earlier version;
+# added columns are empty (null) until designs are re-analyzed
+def add_missing_columns():
+    inspector = sqlalchemy.inspect(engine)
+    quote = engine.dialect.identifier_preparer.quote
+    tables = set(inspector.get_table_names())
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    connection.execute(sqlalchemy.text("ALTER TABLE {} ADD COLUMN {} {}".format(
+                        quote(table.name),
+                        quote(column.name),
+                        column.type.compile(dialect=engine.dialect)
+                    )))
+
 # function to instantiate a session for route dependencies
 def get_db():
     try:
@@ -6,7 +6,7 @@ from fastapi.staticfiles import StaticFiles
 from humanhash import humanize
 import os
 
-from .database import Base, database, engine
+from .database import Base, add_missing_columns, database, engine
 from .dependencies import cookie_authentication, jwt_authentication, fastapi_users, user_db
 from .routers.registration import get_register_router
 from .routers.design import router as design_router
@@ -78,6 +78,7 @@ app.mount("/", StaticFiles(directory="dist", html=True), name="frontend")
 @app.on_event("startup")
 async def startup():
     Base.metadata.create_all(engine)
+    add_missing_columns()
     await database.connect()
     try:
         await fastapi_users.create_user(
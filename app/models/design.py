@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, DateTime, Integer, Float, String
+from sqlalchemy import Boolean, Column, DateTime, Integer, Float, LargeBinary, String
 
 from ..database import Base
 
@@ -11,6 +11,9 @@ class Design(Base):
     designer = Column(String)
     name = Column(String)
     thumbnail = Column(String)
+    thumbnail_size = Column(Integer)
+    thumbnail_detail = Column(String)
+    thumbnail_detail_size = Column(Integer)
     mass = Column(Float)
     width = Column(Float)
     length = Column(Float)
@@ -24,6 +27,7 @@ class Design(Base):
     requirements_json = Column(String)
     cost_json = Column(String)
     value_json = Column(String)
+    bricks_data = Column(LargeBinary)
     is_valid = Column(Boolean)
     total_cost = Column(Float)
     total_revenue = Column(Float)
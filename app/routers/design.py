@@ -1,30 +1,211 @@
-import aiofiles
 from datetime import datetime, timezone
+import functools
 from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 import json
+import logging
+import numpy as np
 from sqlalchemy import desc, or_
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, defer
 from sqlalchemy.orm.exc import NoResultFound
-from tempfile import TemporaryDirectory
 from typing import List, Optional
-import os
-from zipfile import ZipFile, BadZipFile
+from zipfile import BadZipFile
 
 from ..database import get_db
 from ..schemas.user import User
-from ..schemas.design import Design, DesignAnalysis, DesignsResponse
+from ..schemas.design import Design, DesignAnalysis, DesignStage, DesignSummary, DesignsResponse
 from ..models.design import Design as DesignModel
 from ..dependencies import fastapi_users
 
-from ..analysis.cost import get_cost_analysis
-from ..analysis.value import get_value_analysis
-from ..analysis.requirements import get_requirements_analysis
-from ..analysis.dsm import get_dsm_analysis
-from ..analysis.utils import crop_image, get_design_id, get_design_name, get_thumbnail, get_bricks
+from ..schemas.dsm import DesignStructureMatrix, DSM_DENSE, DSM_SPARSE, MatrixTooLarge, check_format
+from ..schemas.cost import CostAnalysis
+from ..schemas.requirements import RequirementsAnalysis
+from ..schemas.value import ValueAnalysis
+from ..schemas.scenario import Scenario, ScenarioDesign, ScenarioResponse
+
+from ..analysis.cost import __version__ as cost_version
+from ..analysis.value import __version__ as value_version
+from ..analysis.requirements import REQUIREMENT_NAMES, __version__ as requirements_version
+from ..analysis.dsm import __version__ as dsm_version
+from ..analysis.budget import MAX_BRICKS, get_budget
+from ..analysis.engines import run_analysis
+from ..analysis.metrics import log_metric_report
+from ..analysis.scenario import Tradespace, get_ranking
+from ..analysis.archive import IoArchive, read_design_model, read_upload, UploadTooLarge
+from ..analysis.bricklist import decode_bricks, encode_bricks
+from ..analysis.utils import get_brick_array, get_thumbnails, humanize_design_id, parse_ldr, TooManyBricks
+
+logger = logging.getLogger(__name__)
 
 # instantiate the router
 router = APIRouter()
 
+# analyses stored with each design, cheapest first: (current version,
+# function, schema) (each function runs the configured analysis engine,
+# see `engines`)
+ANALYSES = {
+    "requirements": (requirements_version, functools.partial(run_analysis, "requirements"), RequirementsAnalysis),
+    "value": (value_version, functools.partial(run_analysis, "value"), ValueAnalysis),
+    "cost": (cost_version, functools.partial(run_analysis, "cost"), CostAnalysis),
+    "dsm": (dsm_version, functools.partial(run_analysis, "dsm"), DesignStructureMatrix)
+}
+
+# thumbnail fields stored with each design
+THUMBNAIL_FIELDS = (
+    "thumbnail",
+    "thumbnail_size",
+    "thumbnail_detail",
+    "thumbnail_detail_size"
+)
+
+# query parameter to select the design structure matrix format
+DSM_FORMAT_QUERY = Query(
+    DSM_DENSE,
+    regex="^({}|{})$".format(DSM_DENSE, DSM_SPARSE),
+    description="Design structure matrix format: dense (matrix, only for designs up to ISE_DSM_MATRIX_LIMIT bricks) or sparse (edges)."
+)
+
+def get_stale_analyses(db_design):
+    """
+    Gets the names of the analyses of a stored design which are missing or
+    were computed by a different analysis version.
+
+    Args:
+        db_design (`:obj:DesignModel`): the stored design (or None).
+
+    Returns:
+        Set[str]: the names of the stale analyses.
+    """
+    if db_design is None:
+        return set(ANALYSES)
+    return set(
+        name
+        for name, (version, get_analysis, schema) in ANALYSES.items()
+        if getattr(db_design, name + "_json") is None
+        or json.loads(getattr(db_design, name + "_json")).get("version") != version
+    )
+
+def get_design_analysis(db_design, dsm_format=DSM_DENSE):
+    """
+    Gets the analysis of a stored design.
+
+    Args:
+        db_design (`:obj:DesignModel`): the stored design.
+        dsm_format (str): the design structure matrix format (dense or sparse).
+
+    Returns:
+        `:obj:DesignAnalysis`: the design analysis.
+    """
+    dsm = get_dsm_in_format(DesignStructureMatrix.parse_raw(db_design.dsm_json), dsm_format)
+    requirements = RequirementsAnalysis.parse_raw(db_design.requirements_json)
+    cost = CostAnalysis.parse_raw(db_design.cost_json)
+    return DesignAnalysis(
+        **db_design.__dict__,
+        dsm = dsm,
+        requirements = requirements,
+        cost = cost,
+        value = json.loads(db_design.value_json),
+        approximate = get_approximate_fields(dsm, requirements, cost)
+    )
+
+def get_dsm_in_format(dsm, dsm_format):
+    """
+    Gets a design structure matrix in a format, reporting dense matrices that
+    are too large as unprocessable.
+
+    Args:
+        dsm (`:obj:DesignStructureMatrix`): the design structure matrix.
+        dsm_format (str): the format (dense or sparse).
+
+    Returns:
+        `:obj:DesignStructureMatrix`: the design structure matrix.
+    """
+    try:
+        return dsm.to_format(dsm_format)
+    except MatrixTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
+
+def get_approximate_fields(dsm, requirements, cost):
+    """
+    Gets the approximate fields of a design analysis.
+
+    Args:
+        dsm (`:obj:DesignStructureMatrix`): the design structure matrix.
+        requirements (`:obj:RequirementsAnalysis`): the requirements analysis.
+        cost (`:obj:CostAnalysis`): the cost analysis.
+
+    Returns:
+        List[str]: the approximate fields (dotted paths).
+    """
+    return (
+        ["dsm." + field for field in dsm.approximate]
+        + ["requirements." + field for field in requirements.approximate]
+        + (["is_valid"] if "is_valid" in requirements.approximate else [])
+        + ["cost." + field for field in cost.approximate]
+        + (["total_cost", "total_profit", "total_roi"] if "total" in cost.approximate else [])
+    )
+
+def read_design_file(read, *args):
+    """
+    Reads from a `.io` file, reporting unreadable files as bad requests and
+    files that are too large as such.
+    """
+    try:
+        return read(*args)
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Design files are too large."
+        )
+    except (BadZipFile, KeyError, RuntimeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Could not extract design files."
+        )
+
+def read_design_bricks(ldr_text):
+    """
+    Parses the bricks of an uploaded model, reporting models that expand to
+    more than `MAX_BRICKS` bricks as too large (before building them) and
+    unreadable models as bad requests.
+    """
+    try:
+        return parse_ldr(ldr_text, MAX_BRICKS)
+    except TooManyBricks as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Could not parse design model."
+        )
+
+async def read_design_upload(file):
+    """
+    Reads an uploaded `.io` file, reporting other files as bad requests and
+    files that are too large as such.
+    """
+    # verify the POST request has file extension `.io`
+    if (file.filename.rsplit('.', 1)[1].lower() not in {'io'}):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Must upload a `.io` file."
+        )
+    # stream the .io file into a bounded buffer
+    try:
+        return await read_upload(file)
+    except UploadTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Uploaded file is too large."
+        )
+
 # route to list designs (conforming to datatable's server-side api)
 @router.get("/", status_code=200)
 async def list_designs(
@@ -35,6 +216,7 @@ async def list_designs(
     order_column: int = Query(None, alias="order[0][column]"),
     order_direction: str = Query("asc", alias="order[0][dir]"),
     search: str = Query(None, alias="search[value]"),
+    dsm_format: str = DSM_FORMAT_QUERY,
     user: User = Depends(fastapi_users.current_user(active=True)),
     db: Session = Depends(get_db)
 ):
@@ -71,39 +253,131 @@ async def list_designs(
             filtered_designs = filtered_designs.order_by(
                 sortable_columns.get(order_column)
             )
-    returned_designs = filtered_designs.offset(start).limit(length)
+    # skip loading detail images and bricks which are not listed
+    returned_designs = filtered_designs.options(
+        defer(DesignModel.thumbnail_detail),
+        defer(DesignModel.bricks_data)
+    ).offset(start).limit(length)
     return DesignsResponse(
         draw = draw,
         records_total = total_designs.count(),
         records_filtered = filtered_designs.count(),
         designs = [
-            DesignAnalysis(
-                **db_design.__dict__,
-                dsm = json.loads(db_design.dsm_json),
-                requirements = json.loads(db_design.requirements_json),
-                cost = json.loads(db_design.cost_json),
-                value = json.loads(db_design.value_json)
-            )
+            get_design_analysis(db_design, dsm_format)
             for db_design in returned_designs.all()
         ]
     )
 
+# route to re-evaluate all designs under an alternative market scenario
+@router.post("/scenario", response_model=ScenarioResponse, status_code=200)
+async def evaluate_scenario(
+    scenario: Scenario,
+    user: User = Depends(fastapi_users.current_user(active=True)),
+    db: Session = Depends(get_db)
+):
+    # reject unknown requirements (which no design would meet)
+    unknown = sorted(set(scenario.requirements or []) - set(REQUIREMENT_NAMES))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Unknown requirements: {} (known requirements: {}).".format(
+                ", ".join(unknown), ", ".join(REQUIREMENT_NAMES)
+            )
+        )
+    # load only the stored analyses (and names) of each design
+    db_designs = db.query(
+        DesignModel.design_id,
+        DesignModel.name,
+        DesignModel.designer,
+        DesignModel.requirements_json,
+        DesignModel.cost_json,
+        DesignModel.value_json
+    ).all()
+    tradespace, skipped = Tradespace.from_stored(
+        (
+            db_design.design_id,
+            db_design.requirements_json,
+            db_design.cost_json,
+            db_design.value_json
+        )
+        for db_design in db_designs
+    )
+    results = tradespace.evaluate(scenario.cost, scenario.value, scenario.requirements)
+    names = {
+        db_design.design_id: (db_design.name, db_design.designer)
+        for db_design in db_designs
+    }
+    # report undefined (non-finite) results, e.g., the ROI of a design
+    # without cost, as null
+    columns = {
+        name: (
+            values.tolist() if values.dtype == bool
+            else np.where(np.isfinite(values), values, None).tolist()
+        )
+        for name, values in results.items()
+    }
+    return ScenarioResponse(
+        designs=[
+            ScenarioDesign(
+                design_id=tradespace.design_ids[i],
+                name=names[tradespace.design_ids[i]][0],
+                designer=names[tradespace.design_ids[i]][1],
+                **{name: values[i] for name, values in columns.items()}
+            )
+            for i in get_ranking(results, scenario.rank_by).tolist()
+        ],
+        skipped=skipped
+    )
+
+def get_requirements_check(user, design_id, ldr_text):
+    """
+    Gets only the requirements analysis (no dsm, cost or value) of an
+    uploaded design.
+
+    Args:
+        user (`:obj:User`): the uploading user.
+        design_id (str): the design identifier.
+        ldr_text (str): the model (LDraw).
+
+    Returns:
+        `:obj:RequirementsAnalysis`: the requirements analysis.
+    """
+    design = Design(
+        design_id=design_id,
+        name=humanize_design_id(design_id),
+        designer=user.name,
+        timestamp=datetime.now(timezone.utc),
+        bricks=get_brick_array(read_design_bricks(ldr_text))
+    )
+    requirements_analysis = run_analysis("requirements", design)
+    log_metric_report(design)
+    return requirements_analysis
+
+# route to check the requirements of a design without storing it
+@router.post("/check", response_model=RequirementsAnalysis, status_code=200)
+async def check_design(
+    file: UploadFile = File(...),
+    user: User = Depends(fastapi_users.current_user(active=True))
+):
+    io_file = await read_design_upload(file)
+    with io_file:
+        # read only the model from the .io file (not the thumbnail)
+        archive = read_design_file(IoArchive, io_file)
+        design_id, ldr_text = read_design_file(read_design_model, archive)
+    # parse and analyze the model in a worker thread
+    return await run_in_threadpool(get_requirements_check, user, design_id, ldr_text)
+
 # route to get information for a design by id
 @router.get("/{design_id}", response_model=DesignAnalysis, status_code=200)
 async def get_design(
     design_id: str,
+    dsm_format: str = DSM_FORMAT_QUERY,
     user: User = Depends(fastapi_users.current_user(active=True)),
     db: Session = Depends(get_db)
 ):
     try:
         db_design = db.query(DesignModel).filter(DesignModel.design_id==design_id).one()
-        return DesignAnalysis(
-            **db_design.__dict__,
-            dsm = json.loads(db_design.dsm_json),
-            requirements = json.loads(db_design.requirements_json),
-            cost = json.loads(db_design.cost_json),
-            value = json.loads(db_design.value_json)
-        )
+        return get_design_analysis(db_design, dsm_format)
     except NoResultFound:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -114,6 +388,7 @@ async def get_design(
 @router.delete("/{design_id}", response_model=DesignAnalysis, status_code=200)
 async def delete_design(
     design_id: str,
+    dsm_format: str = DSM_FORMAT_QUERY,
     user: User = Depends(fastapi_users.current_user(active=True, superuser=True)),
     db: Session = Depends(get_db)
 ):
@@ -121,119 +396,215 @@ async def delete_design(
         db_design = db.query(DesignModel).filter(DesignModel.design_id==design_id).one()
         db.delete(db_design)
         db.commit()
-        return DesignAnalysis(
-            **db_design.__dict__,
-            dsm = json.loads(db_design.dsm_json),
-            requirements = json.loads(db_design.requirements_json),
-            cost = json.loads(db_design.cost_json),
-            value = json.loads(db_design.value_json)
-        )
+        return get_design_analysis(db_design, dsm_format)
     except NoResultFound:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Design not found."
         )
 
-# route to create a new design
-@router.post("/", response_model=DesignAnalysis, status_code=201)
-async def create_design(
-    file: UploadFile = File(...),
-    user: User = Depends(fastapi_users.current_user(active=True)),
-    db: Session = Depends(get_db)
-):
-    # verify the POST request has file extension `.io`
-    if (file.filename.rsplit('.', 1)[1].lower() not in {'io'}):
+def get_design_stages(user, db, db_design, design_id, ldr_text, stale_analyses, thumbnail_data, dsm_format=DSM_DENSE):
+    """
+    Analyzes and stores an uploaded design stage by stage, from the cheapest
+    to the most expensive analysis.
+
+    Args:
+        user (`:obj:User`): the uploading user.
+        db (`:obj:Session`): the database session.
+        db_design (`:obj:DesignModel`): the stored design (or None).
+        design_id (str): the design identifier.
+        ldr_text (str): the model (LDraw).
+        stale_analyses (Set[str]): the analyses to compute (see
+            `get_stale_analyses`).
+        thumbnail_data (bytes): the thumbnail image to process (or None,
+            if already stored).
+        dsm_format (str): the design structure matrix format (dense or sparse).
+
+    Yields:
+        (str, object): the name and result of each stage: parse
+            (`:obj:DesignSummary`), requirements, value, cost, dsm and
+            design (the stored `:obj:DesignAnalysis`).
+    """
+    if not stale_analyses:
+        # return the existing design analysis without recomputation
+        design_analysis = get_design_analysis(db_design, dsm_format)
+        yield "parse", DesignSummary(**design_analysis.dict(), stale_analyses=[])
+        for name in ANALYSES:
+            yield name, getattr(design_analysis, name)
+        yield "design", design_analysis
+        return
+    # reload stored bricks (if encoded with the current catalog) or parse them
+    brick_arrays = None
+    if db_design is not None and db_design.bricks_data is not None:
+        try:
+            brick_arrays = decode_bricks(db_design.bricks_data)
+        except ValueError:
+            pass
+        # (parse designs stored before a lower brick limit to reject them)
+        if brick_arrays is not None and len(brick_arrays["bl_id"]) > MAX_BRICKS:
+            brick_arrays = None
+    if brick_arrays is None:
+        brick_arrays = read_design_bricks(ldr_text)
+    # build the design (keeping the original submission for existing designs)
+    design = Design(
+        design_id=design_id,
+        name=humanize_design_id(design_id),
+        designer=user.name if db_design is None else db_design.designer,
+        timestamp=datetime.now(timezone.utc) if db_design is None else db_design.timestamp,
+        bricks=get_brick_array(brick_arrays)
+    )
+    # reject a dense matrix that would be too large before analyzing
+    try:
+        check_format(dsm_format, len(design.get_valid_bricks()))
+    except MatrixTooLarge as e:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Must upload a `.io` file."
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
         )
-    # create a temporary working directory
-    with TemporaryDirectory() as tempdir:
-        io_path = os.path.join(tempdir, 'design.io')
-        ldr_path = os.path.join(tempdir, 'model.ldr')
-        thumb_path = os.path.join(tempdir, 'thumbnail.png')
-        # write io file to temporary directory
-        async with aiofiles.open(io_path, 'wb') as io_file:
-            content = await file.read()
-            await io_file.write(content)
-        # extract key files from the .io file
-        try:
-            zip_key = b'\x73\x6f\x68\x6f\x30\x39\x30\x39'
-            with ZipFile(io_path, 'r') as zip:
-                zip.extract('thumbnail.png', tempdir, zip_key)
-                zip.extract('model.ldr', tempdir, zip_key)
-        except BadZipFile:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Could not extract design files."
-            )
-        # crop the thumbnail image
-        crop_image(thumb_path)
-        # parse the design
-        design = Design(
-            design_id=get_design_id(ldr_path),
-            name=get_design_name(ldr_path),
-            designer=user.name,
-            timestamp=datetime.now(timezone.utc),
-            bricks=get_bricks(ldr_path)
-        )
-        # perform requirements analysis
-        requirements_analysis = get_requirements_analysis(design)
-        # perform cost analysis
-        cost_analysis = get_cost_analysis(design)
-        # perform market analysis
-        value_analysis = get_value_analysis(design)
-        # assemble the design analysis
-        design_analysis = DesignAnalysis(
-            **design.dict(),
-            mass=design.get_mass(),
-            width=design.get_width()*0.4,
-            length=design.get_length()*0.4,
-            height=design.get_height()*0.4,
-            wheelbase=design.get_wheelbase()*0.4,
-            track=design.get_track()*0.4,
-            volume=design.get_volume()/1000*0.4**3,
-            number_seats=design.get_num_seats(),
-            cargo_volume=design.get_cargo_volume()/1000*0.4**3,
-            thumbnail=get_thumbnail(thumb_path),
-            dsm=get_dsm_analysis(design),
-            requirements=requirements_analysis,
-            cost=cost_analysis,
-            value=value_analysis,
-            is_valid=requirements_analysis.is_valid,
-            total_cost=cost_analysis.total,
-            total_revenue=value_analysis.price,
-            total_profit=value_analysis.price - cost_analysis.total,
-            total_roi=(value_analysis.price - cost_analysis.total)/cost_analysis.total
+    # start the time budget of the analyses (see `budget`)
+    get_budget(design)
+    yield "parse", DesignSummary(
+        **design.dict(exclude={"bricks"}),
+        number_bricks=len(design.bricks),
+        stale_analyses=[name for name in ANALYSES if name in stale_analyses]
+    )
+    # perform stale analyses and reuse the current ones
+    analyses = {}
+    for name, (version, get_analysis, schema) in ANALYSES.items():
+        analyses[name] = (
+            get_analysis(design)
+            if name in stale_analyses
+            else schema.parse_raw(getattr(db_design, name + "_json"))
         )
+        yield name, get_dsm_in_format(analyses[name], dsm_format) if name == "dsm" else analyses[name]
+    log_metric_report(design)
+    requirements_analysis = analyses["requirements"]
+    cost_analysis = analyses["cost"]
+    value_analysis = analyses["value"]
+    # process the thumbnail unless it is already stored
+    if thumbnail_data is not None:
+        thumbnails = get_thumbnails(thumbnail_data)
+    else:
+        thumbnails = {
+            field: getattr(db_design, field)
+            for field in THUMBNAIL_FIELDS
+        }
+    # assemble the design analysis
+    design_analysis = DesignAnalysis(
+        **design.dict(),
+        mass=design.get_mass(),
+        width=design.get_width()*0.4,
+        length=design.get_length()*0.4,
+        height=design.get_height()*0.4,
+        wheelbase=design.get_wheelbase()*0.4,
+        track=design.get_track()*0.4,
+        volume=design.get_volume()/1000*0.4**3,
+        number_seats=design.get_num_seats(),
+        cargo_volume=design.get_cargo_volume()/1000*0.4**3,
+        **thumbnails,
+        dsm=analyses["dsm"],
+        requirements=requirements_analysis,
+        cost=cost_analysis,
+        value=value_analysis,
+        is_valid=requirements_analysis.is_valid,
+        total_cost=cost_analysis.total,
+        total_revenue=value_analysis.price,
+        total_profit=value_analysis.price - cost_analysis.total,
+        total_roi=(
+            (value_analysis.price - cost_analysis.total)/cost_analysis.total
+            if cost_analysis.total > 0 else None
+        )
+    )
+    # encode the bricks to reload them without parsing
     try:
-        # try to update an existing design
-        db_design = db.query(DesignModel).filter(DesignModel.design_id==design_analysis.design_id).one()
-        for field in design_analysis.dict(exclude={"dsm","requirements","cost","value"}):
+        bricks_data = encode_bricks(brick_arrays)
+    except ValueError:
+        bricks_data = None
+    if db_design is not None:
+        # update the existing design
+        for field in design_analysis.dict(exclude={"dsm","requirements","cost","value","approximate"}):
             if hasattr(db_design, field):
                 setattr(db_design, field, design_analysis.dict()[field])
-        setattr(db_design, "dsm_json", design_analysis.dsm.json())
+        setattr(db_design, "dsm_json", design_analysis.dsm.to_format(DSM_SPARSE).json())
         setattr(db_design, "requirements_json", design_analysis.requirements.json())
         setattr(db_design, "cost_json", design_analysis.cost.json())
         setattr(db_design, "value_json", design_analysis.value.json())
-    except NoResultFound:
+        setattr(db_design, "bricks_data", bricks_data)
+    else:
         # otherwise, create a new design
         db_design = DesignModel(
-            **design_analysis.dict(exclude={"dsm","requirements","cost","value"}),
-            dsm_json = design_analysis.dsm.json(),
+            **design_analysis.dict(exclude={"dsm","requirements","cost","value","approximate"}),
+            dsm_json = design_analysis.dsm.to_format(DSM_SPARSE).json(),
             requirements_json = design_analysis.requirements.json(),
             cost_json = design_analysis.cost.json(),
-            value_json = design_analysis.value.json()
+            value_json = design_analysis.value.json(),
+            bricks_data = bricks_data
         )
         db.add(db_design)
     # commit the transactions and refresh the database model to get id (if new)
     db.commit()
     db.refresh(db_design)
     # return resulting design analysis
-    return DesignAnalysis(
-        **db_design.__dict__,
-        dsm = json.loads(db_design.dsm_json),
-        requirements = json.loads(db_design.requirements_json),
-        cost = json.loads(db_design.cost_json),
-        value = json.loads(db_design.value_json)
+    yield "design", get_design_analysis(db_design, dsm_format)
+
+def get_stage_lines(db, design_id, stages):
+    """
+    Formats design stages as lines of JSON, ending with an error stage if a
+    stage fails (the response status is already sent).
+
+    Args:
+        db (`:obj:Session`): the database session.
+        design_id (str): the design identifier.
+        stages (Iterator[(str, object)]): the stages (see `get_design_stages`).
+
+    Yields:
+        str: one line of JSON (`:obj:DesignStage`) per stage.
+    """
+    try:
+        for stage, data in stages:
+            yield DesignStage(stage=stage, data=data).json(by_alias=True) + "\n"
+    except Exception as e:
+        logger.exception("Streamed upload of design %s failed", design_id)
+        db.rollback()
+        detail = e.detail if isinstance(e, HTTPException) else "Could not analyze design."
+        yield DesignStage(stage="error", data={"detail": detail}).json(by_alias=True) + "\n"
+
+# route to create a new design
+@router.post("/", response_model=DesignAnalysis, status_code=201)
+async def create_design(
+    file: UploadFile = File(...),
+    dsm_format: str = DSM_FORMAT_QUERY,
+    stream: bool = Query(
+        False,
+        description="Stream each stage as soon as it finishes (newline-delimited JSON)."
+    ),
+    user: User = Depends(fastapi_users.current_user(active=True)),
+    db: Session = Depends(get_db)
+):
+    io_file = await read_design_upload(file)
+    with io_file:
+        # read the model from the .io file in memory
+        archive = read_design_file(IoArchive, io_file)
+        design_id, ldr_text = read_design_file(read_design_model, archive)
+        # look up an existing analysis of the same model
+        db_design = db.query(DesignModel).filter(DesignModel.design_id==design_id).one_or_none()
+        stale_analyses = get_stale_analyses(db_design)
+        # read the thumbnail (processed after the analyses) unless it is already stored
+        thumbnail_data = None
+        if stale_analyses and (db_design is None or db_design.thumbnail_detail is None):
+            thumbnail_data = read_design_file(archive.read, 'thumbnail.png')
+    stages = get_design_stages(
+        user, db, db_design, design_id, ldr_text, stale_analyses, thumbnail_data, dsm_format
     )
+    if stream:
+        # send each stage as one line of JSON as soon as it finishes
+        return StreamingResponse(
+            get_stage_lines(db, design_id, stages),
+            status_code=status.HTTP_201_CREATED,
+            media_type="application/x-ndjson",
+            # skip compression and proxy buffering, which hold back stages
+            headers={"Content-Encoding": "identity", "X-Accel-Buffering": "no"}
+        )
+    # otherwise, perform all stages (in a worker thread, like the streamed
+    # stages) and return the last (the design analysis)
+    return (await run_in_threadpool(list, stages))[-1][1]
@@ -2,6 +2,7 @@ from fastapi_utils.api_model import APIModel
 from pydantic import conlist, Field
 from typing import List, Optional
 import numpy as np
+from scipy import sparse
 
 class Brick(APIModel):
     bl_id: Optional[str] = Field(
@@ -108,3 +109,544 @@ class Brick(APIModel):
             ) > 0
             for forward_axis in self.valid_forward_axes
         )
+
+def _is_overlapping(lower, upper, first, second, inclusive=False):
+    """
+    Determines whether pairs of bounding boxes intersect on all three axes.
+
+    Args:
+        lower (`:obj:array`): the Nx3 lower bounds.
+        upper (`:obj:array`): the Nx3 upper bounds.
+        first (`:obj:array`): the first box index of each pair.
+        second (`:obj:array`): the second box index of each pair.
+        inclusive (bool): True, if position checks are inclusive (<=, >=).
+
+    Returns:
+        `:obj:array`: True for each intersecting pair.
+    """
+    with np.errstate(invalid='ignore'):
+        if inclusive:
+            return np.all(
+                (lower[first] <= upper[second]) & (upper[first] >= lower[second]),
+                axis=1
+            )
+        return np.all(
+            (lower[first] < upper[second]) & (upper[first] > lower[second]),
+            axis=1
+        )
+
+def _get_runs(counts):
+    """
+    Gets the position of each element within runs of given lengths, e.g.,
+    [2, 3] gives [0, 1, 0, 1, 2].
+    """
+    return np.arange(np.sum(counts)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+class DisjointSet(object):
+    """
+    Disjoint-set (union-find) forest with union by size and path halving.
+    """
+    def __init__(self, size):
+        """
+        Initializes this disjoint set with each element in its own set.
+
+        Args:
+            size (int): the number of elements.
+        """
+        self.parent = list(range(size))
+        self.size = [1]*size
+
+    def find(self, element):
+        """
+        Finds the representative element of the set containing an element.
+        """
+        parent = self.parent
+        while parent[element] != element:
+            parent[element] = parent[parent[element]]
+            element = parent[element]
+        return element
+
+    def union(self, first, second):
+        """
+        Merges the sets containing two elements.
+
+        Returns:
+            bool: True, if the elements were in different sets.
+        """
+        first = self.find(first)
+        second = self.find(second)
+        if first == second:
+            return False
+        if self.size[first] < self.size[second]:
+            first, second = second, first
+        self.parent[second] = first
+        self.size[first] += self.size[second]
+        return True
+
+    def get_labels(self):
+        """
+        Gets consecutive set labels numbered in order of first element.
+
+        Returns:
+            `:obj:array`: the set label of each element.
+        """
+        labels = {}
+        return np.array([
+            labels.setdefault(self.find(element), len(labels))
+            for element in range(len(self.parent))
+        ], dtype=int)
+
+class BrickArray(object):
+    """
+    Columnar, read-only collection of bricks for vectorized analysis.
+
+    Each brick field is stored as an N-element array (vertices as Nx8x3 with
+    precomputed Nx3 bounding box bounds) and `:obj:Brick` views are only
+    built (and cached) when a brick is accessed individually, e.g., to be
+    serialized.
+    """
+    # per-brick columns (undefined bricks have NaN or None attributes)
+    COLUMNS = (
+        "bl_id", "ld_color", "position", "rotation", "vertices", "is_defined",
+        "is_valid", "id", "name", "cost", "mass", "safety", "coolness",
+        "volume", "valid_forward_axes", "bl_color"
+    )
+
+    def __init__(self, **columns):
+        """
+        Initializes this brick array.
+
+        Args:
+            **columns: the N-element arrays for each of `COLUMNS`.
+        """
+        for key in self.COLUMNS:
+            setattr(self, key, columns[key])
+        with np.errstate(invalid='ignore'):
+            self.lower = np.min(self.vertices, axis=1)
+            self.upper = np.max(self.vertices, axis=1)
+        self._views = [None]*len(self.bl_id)
+
+    @classmethod
+    def from_bricks(cls, bricks):
+        """
+        Builds a brick array from a list of bricks.
+
+        Args:
+            bricks (List[`:obj:Brick`]): the bricks.
+
+        Returns:
+            `:obj:BrickArray`: the brick array.
+        """
+        bricks = [
+            brick if isinstance(brick, Brick) else Brick.parse_obj(brick)
+            for brick in bricks
+        ]
+        def _object_column(key):
+            column = np.empty(len(bricks), dtype=object)
+            column[:] = [getattr(brick, key) for brick in bricks]
+            return column
+        def _float_column(key):
+            return np.array([
+                np.nan if getattr(brick, key) is None else getattr(brick, key)
+                for brick in bricks
+            ], dtype=float)
+        array = cls(
+            bl_id=_object_column("bl_id"),
+            ld_color=_object_column("ld_color"),
+            position=np.array([brick.position for brick in bricks], dtype=float).reshape(-1, 3),
+            rotation=np.array([brick.rotation for brick in bricks], dtype=float).reshape(-1, 3, 3),
+            vertices=np.array([
+                np.full((8, 3), np.nan) if brick.vertices is None else brick.vertices
+                for brick in bricks
+            ], dtype=float).reshape(-1, 8, 3),
+            is_defined=np.array([brick.vertices is not None for brick in bricks], dtype=bool),
+            is_valid=np.array([brick.is_valid for brick in bricks], dtype=bool),
+            id=_object_column("id"),
+            name=_object_column("name"),
+            cost=_float_column("cost"),
+            mass=_float_column("mass"),
+            safety=_float_column("safety"),
+            coolness=_float_column("coolness"),
+            volume=_float_column("volume"),
+            valid_forward_axes=_object_column("valid_forward_axes"),
+            bl_color=_object_column("bl_color")
+        )
+        array._views = bricks
+        return array
+
+    def __len__(self):
+        return len(self._views)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __getitem__(self, key):
+        """
+        Gets a brick view (for an integer key) or a brick array (for a
+        boolean mask or index array).
+        """
+        if not isinstance(key, (int, np.integer)):
+            return self.select(key)
+        brick = self._views[key]
+        if brick is None:
+            brick = self._views[key] = self._get_view(key)
+        return brick
+
+    def _get_view(self, i):
+        """
+        Builds a brick view for a brick index.
+        """
+        keys = (
+            self.COLUMNS[:2] if not self.is_defined[i]
+            else self.COLUMNS[:2] + self.COLUMNS[6:]
+        )
+        values = {
+            key: getattr(self, key)[i]
+            for key in keys
+        }
+        if self.is_defined[i]:
+            values["vertices"] = self.vertices[i].tolist()
+        return Brick(
+            position=self.position[i].tolist(),
+            rotation=self.rotation[i].tolist(),
+            **{
+                key: value.item() if isinstance(value, np.generic) else value
+                for key, value in values.items()
+            }
+        )
+
+    def select(self, key):
+        """
+        Selects a subset of bricks.
+
+        Args:
+            key (`:obj:array`): a boolean mask or index array.
+
+        Returns:
+            `:obj:BrickArray`: the selected bricks (sharing cached views).
+        """
+        indices = np.arange(len(self))[key]
+        array = BrickArray(**{
+            column: getattr(self, column)[indices]
+            for column in self.COLUMNS
+        })
+        array._views = [self._views[i] for i in indices]
+        return array
+
+    def tolist(self):
+        """
+        Gets the list of brick views.
+
+        Returns:
+            List[`:obj:Brick`]: the bricks.
+        """
+        return list(self)
+
+    def get_alignment(self, forward_axis):
+        """
+        Determines whether each brick is aligned with a forward axis (see
+        `Brick.is_aligned`).
+
+        Args:
+            forward_axis (`:obj:array`): unit vector pointing forward.
+
+        Returns:
+            `:obj:array`: True, if the brick is properly aligned.
+        """
+        # flatten the valid forward axes of all bricks with their owners
+        counts = np.array([
+            0 if axes is None else len(axes)
+            for axes in self.valid_forward_axes.tolist()
+        ], dtype=int)
+        owners = np.repeat(np.arange(len(self)), counts)
+        axes = np.array([
+            axis
+            for axes in self.valid_forward_axes.tolist() if axes is not None
+            for axis in axes
+        ], dtype=float).reshape(-1, 3)
+        # aligned if any rotated axis points forward
+        forward = np.around(np.dot(
+            np.matmul(self.rotation[owners], axes[:, :, np.newaxis])[:, :, 0],
+            forward_axis
+        )) > 0
+        aligned = np.array([
+            axes is None for axes in self.valid_forward_axes.tolist()
+        ], dtype=bool)
+        np.logical_or.at(aligned, owners, forward)
+        return aligned
+
+    def get_overlap_pairs(self, inclusive=False):
+        """
+        Finds the pairs of distinct bricks whose bounding boxes intersect
+        (see `Brick.intersects`). A sort-based sweep-and-prune broad phase
+        along the x axis limits the candidates to bricks whose x intervals
+        overlap before checking all three axes.
+
+        Args:
+            inclusive (bool): True, if position checks are inclusive (<=, >=).
+
+        Returns:
+            (`:obj:array`, `:obj:array`): the first and second brick indices
+                of each pair (first < second).
+        """
+        order = np.argsort(self.lower[:, 0], kind="stable")
+        lower = self.lower[order]
+        upper = self.upper[order]
+        # candidates start (in sorted order) before each brick ends along x
+        ends = np.searchsorted(
+            lower[:, 0],
+            upper[:, 0],
+            side="right" if inclusive else "left"
+        )
+        counts = np.maximum(ends - np.arange(1, len(order) + 1), 0)
+        first = np.repeat(np.arange(len(order)), counts)
+        second = first + 1 + _get_runs(counts)
+        overlap = _is_overlapping(lower, upper, first, second, inclusive)
+        first = order[first[overlap]]
+        second = order[second[overlap]]
+        return np.minimum(first, second), np.maximum(first, second)
+
+    def get_component_labels(self, inclusive=False, pairs=None):
+        """
+        Labels the connected components of intersecting bricks.
+
+        Args:
+            inclusive (bool): True, if position checks are inclusive (<=, >=).
+            pairs (tuple): the intersecting pairs (see `get_overlap_pairs`),
+                if already found (e.g., with a `:obj:SpatialIndex`).
+
+        Returns:
+            `:obj:array`: the component label (0 to number of components - 1)
+                of each brick.
+        """
+        if pairs is None:
+            pairs = self.get_overlap_pairs(inclusive)
+        components = DisjointSet(len(self))
+        for first, second in zip(*(bricks.tolist() for bricks in pairs)):
+            components.union(first, second)
+        return components.get_labels()
+
+    def get_adjacency(self, inclusive=False, pairs=None):
+        """
+        Gets the sparse matrix of intersecting bricks (see `Brick.intersects`),
+        including each brick with a non-degenerate bounding box with itself.
+
+        Args:
+            inclusive (bool): True, if position checks are inclusive (<=, >=).
+            pairs (tuple): the intersecting pairs (see `get_overlap_pairs`),
+                if already found (e.g., with a `:obj:SpatialIndex`).
+
+        Returns:
+            `:obj:csr_matrix`: the NxN boolean adjacency matrix.
+        """
+        first, second = self.get_overlap_pairs(inclusive) if pairs is None else pairs
+        with np.errstate(invalid='ignore'):
+            diagonal = np.flatnonzero(
+                np.all(self.lower <= self.upper, axis=1) if inclusive
+                else np.all(self.lower < self.upper, axis=1)
+            )
+        return sparse.csr_matrix(
+            (
+                np.ones(2*len(first) + len(diagonal), dtype=bool),
+                (
+                    np.concatenate((first, second, diagonal)),
+                    np.concatenate((second, first, diagonal))
+                )
+            ),
+            shape=(len(self), len(self))
+        )
+
+    @classmethod
+    def __get_validators__(cls):
+        yield cls.validate
+
+    @classmethod
+    def validate(cls, value):
+        """
+        Validates a brick array (or builds one from a list of bricks).
+        """
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, (list, tuple)):
+            return cls.from_bricks(value)
+        raise TypeError("Bricks must be a BrickArray or a list of bricks.")
+
+    @classmethod
+    def __modify_schema__(cls, field_schema):
+        field_schema.update(type="array", items=Brick.schema())
+
+# largest number of (cell, box) entries of a spatial index (at least 8 per
+# box); coarser cells are used for grids that would exceed it
+ENTRY_LIMIT = 1000000
+
+class SpatialIndex(object):
+    """
+    Uniform hash grid over the LDraw unit (LDU) grid for bounding box queries.
+
+    Each box is registered in every grid cell it covers (cells are closed on
+    both sides so touching boxes share a cell), and the (cell, box) entries
+    are sorted by cell so each query is a binary search per cell. The cell
+    size doubles until the entries fit in a limit, so a few boxes much larger
+    than the median cannot cover millions of cells.
+    """
+    def __init__(self, lower, upper, cell_size=None, max_entries=ENTRY_LIMIT):
+        """
+        Initializes this spatial index.
+
+        Args:
+            lower (`:obj:array`): the Nx3 lower bounds (LDU).
+            upper (`:obj:array`): the Nx3 upper bounds (LDU).
+            cell_size (`:obj:array`): the grid cell size along each axis
+                (LDU), or None to use the median box extent.
+            max_entries (int): the largest number of entries (at least 8 per
+                box are allowed).
+        """
+        self.lower = np.asarray(lower, dtype=float).reshape(-1, 3)
+        self.upper = np.asarray(upper, dtype=float).reshape(-1, 3)
+        defined = np.flatnonzero(np.all(
+            np.isfinite(self.lower) & np.isfinite(self.upper), axis=1
+        ))
+        if cell_size is None:
+            cell_size = np.median(
+                self.upper[defined] - self.lower[defined], axis=0
+            ) if len(defined) > 0 else np.ones(3)
+        self.cell_size = np.maximum(np.ceil(cell_size), 1)
+        # coarsen the grid until the entries fit (boxes spanning at most two
+        # cells per axis always fit)
+        max_entries = max(max_entries, 8*len(defined))
+        while True:
+            first_cells = self._get_cells(self.lower[defined])
+            last_cells = self._get_cells(self.upper[defined])
+            spans = last_cells - first_cells + 1
+            if np.sum(np.prod(spans.astype(float), axis=1)) <= max_entries:
+                break
+            self.cell_size = self.cell_size*2
+        self.origin = np.min(first_cells, axis=0) if len(defined) > 0 else np.zeros(3, dtype=np.int64)
+        self.shape = (
+            np.max(last_cells, axis=0) - self.origin + 1
+            if len(defined) > 0 else np.ones(3, dtype=np.int64)
+        )
+        # register each box in each covered cell
+        counts = np.prod(spans, axis=1)
+        boxes = np.repeat(defined, counts)
+        offsets = self._unravel(_get_runs(counts), np.repeat(spans, counts, axis=0))
+        keys = self._get_keys(np.repeat(first_cells, counts, axis=0) + offsets)
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._boxes = boxes[order]
+
+    @staticmethod
+    def _unravel(indices, spans):
+        """
+        Unravels flat indices into 3-d offsets within per-entry spans.
+        """
+        offsets = np.empty((len(indices), 3), dtype=np.int64)
+        offsets[:, 2] = indices % spans[:, 2]
+        indices = indices // spans[:, 2]
+        offsets[:, 1] = indices % spans[:, 1]
+        offsets[:, 0] = indices // spans[:, 1]
+        return offsets
+
+    def _get_cells(self, points):
+        """
+        Gets the grid cells containing points.
+        """
+        return np.floor(points / self.cell_size).astype(np.int64)
+
+    def _get_keys(self, cells):
+        """
+        Gets the hash keys of grid cells.
+        """
+        cells = cells - self.origin
+        return (cells[:, 0]*self.shape[1] + cells[:, 1])*self.shape[2] + cells[:, 2]
+
+    def query(self, lower, upper, inclusive=True):
+        """
+        Finds the boxes that intersect (or touch) a query box.
+
+        Args:
+            lower (`:obj:array`): the query lower bound (LDU).
+            upper (`:obj:array`): the query upper bound (LDU).
+            inclusive (bool): True, if touching boxes are included (<=, >=).
+
+        Returns:
+            `:obj:array`: the sorted indices of the intersecting boxes.
+        """
+        first = np.maximum(self._get_cells(np.asarray(lower, dtype=float)), self.origin)
+        last = np.minimum(self._get_cells(np.asarray(upper, dtype=float)), self.origin + self.shape - 1)
+        if np.any(last < first):
+            return np.zeros(0, dtype=np.int64)
+        spans = last - first + 1
+        count = int(np.prod(spans))
+        keys = self._get_keys(
+            first + self._unravel(np.arange(count), np.tile(spans, (count, 1)))
+        )
+        starts = np.searchsorted(self._keys, keys, side="left")
+        ends = np.searchsorted(self._keys, keys, side="right")
+        candidates = np.unique(self._boxes[
+            np.repeat(starts, ends - starts) + _get_runs(ends - starts)
+        ])
+        bounds_lower = np.vstack((self.lower, np.reshape(lower, (1, 3))))
+        bounds_upper = np.vstack((self.upper, np.reshape(upper, (1, 3))))
+        overlap = _is_overlapping(
+            bounds_lower, bounds_upper,
+            candidates, np.full(len(candidates), len(self.lower)),
+            inclusive
+        )
+        return candidates[overlap]
+
+    def _get_candidate_counts(self):
+        """
+        Gets the number of later entries in the same cell of each entry.
+        """
+        ends = np.searchsorted(self._keys, self._keys, side="right")
+        return ends - np.arange(1, len(self._keys) + 1)
+
+    def count_candidate_pairs(self):
+        """
+        Counts the candidate pairs of boxes sharing a cell (see
+        `get_overlap_pairs`), without finding them.
+
+        Returns:
+            int: the number of candidate pairs (counted once per shared cell).
+        """
+        return int(np.sum(self._get_candidate_counts()))
+
+    def get_overlap_pairs(self, inclusive=False, limit=None):
+        """
+        Finds the pairs of distinct boxes that intersect (see
+        `BrickArray.get_overlap_pairs`) by pairing boxes that share a cell.
+        Above a limit of candidate pairs (see `count_candidate_pairs`), each
+        entry is only paired with the next entries in the same cell, which
+        keeps chains of intersecting boxes (e.g., stacked copies) connected
+        but misses some pairs.
+
+        Args:
+            inclusive (bool): True, if position checks are inclusive (<=, >=).
+            limit (int): the largest number of candidate pairs, or None.
+
+        Returns:
+            (`:obj:array`, `:obj:array`): the first and second box indices of
+                each pair (first < second).
+        """
+        # pair each entry with the later entries in the same cell
+        counts = self._get_candidate_counts()
+        if limit is not None and np.sum(counts) > limit:
+            # find the largest number of later entries per entry within the limit
+            low, high = 0, int(np.max(counts))
+            while low < high:
+                middle = (low + high + 1) // 2
+                if np.sum(np.minimum(counts, middle)) <= limit:
+                    low = middle
+                else:
+                    high = middle - 1
+            counts = np.minimum(counts, low)
+        entries = np.repeat(np.arange(len(self._keys)), counts)
+        first = self._boxes[entries]
+        second = self._boxes[entries + 1 + _get_runs(counts)]
+        first, second = np.minimum(first, second), np.maximum(first, second)
+        # remove pairs found in more than one cell
+        pairs = np.unique(first*len(self.lower) + second)
+        first, second = pairs // max(len(self.lower), 1), pairs % max(len(self.lower), 1)
+        overlap = _is_overlapping(self.lower, self.upper, first, second, inclusive)
+        return first[overlap], second[overlap]
@@ -1,6 +1,44 @@
 from fastapi_utils.api_model import APIModel
 from pydantic import Field
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+class CostParameters(APIModel):
+    engineering: float = Field(
+        0.35,
+        ge=0,
+        description="Engineering overhead rate (fraction of materials and assembly cost)."
+    )
+    marketing: float = Field(
+        0.20,
+        ge=0,
+        description="Marketing overhead rate (fraction of materials and assembly cost)."
+    )
+    facilities: float = Field(
+        0.30,
+        ge=0,
+        description="Facilities overhead rate (fraction of materials and assembly cost)."
+    )
+    administration: float = Field(
+        0.25,
+        ge=0,
+        description="Administration overhead rate (fraction of materials and assembly cost)."
+    )
+    overhead: Optional[float] = Field(
+        None,
+        ge=0,
+        description="Total overhead rate (the sum of the overhead rates, if not set)."
+    )
+
+    def get_overhead_rate(self):
+        """
+        Get the total overhead rate.
+
+        Returns:
+            float: the total overhead rate.
+        """
+        if self.overhead is not None:
+            return self.overhead
+        return self.engineering + self.marketing + self.facilities + self.administration
 
 class BillOfMaterialsLine(APIModel):
     name: str = Field(
@@ -25,6 +63,10 @@ class AssemblyCostAnalysis(APIModel):
         ...,
         description="Cost of integrating components ($)."
     )
+    integration_error: float = Field(
+        0,
+        description="Error bound on the integration cost, if estimated for a large design ($)."
+    )
     total: float = Field(
         ...,
         description="Total assembly cost ($)."
@@ -77,3 +119,7 @@ class CostAnalysis(APIModel):
         ...,
         description="Total cost ($)."
     )
+    approximate: List[str] = Field(
+        [],
+        description="List of approximate fields (estimated from an approximate integration complexity)."
+    )
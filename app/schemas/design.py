@@ -1,16 +1,47 @@
 from datetime import datetime
+import os
 from fastapi_utils.api_model import APIModel
 import numpy as np
-from pydantic import Field
+from pydantic import Field, PrivateAttr
 from scipy.spatial import ConvexHull
-from typing import List, Optional
+from typing import Any, List, Optional
 
-from .brick import Brick
+from .brick import Brick, BrickArray, SpatialIndex
 from .dsm import DesignStructureMatrix
 from .requirements import RequirementsAnalysis
 from .cost import CostAnalysis
 from .value import ValueAnalysis
 
+# largest number of candidate pairs of intersecting bricks searched per design
+# (see `SpatialIndex.get_overlap_pairs`); larger designs get a partial search
+PAIR_LIMIT = int(os.getenv("ISE_ANALYSIS_PAIR_LIMIT", 1000000))
+
+def _get_unique_vertices(vertices):
+    """
+    Get the distinct vertices, packing integer (LDU grid) coordinates into a
+    single key so adjacent bricks' shared corners are removed with a 1-d sort.
+
+    Args:
+        vertices (`:obj:array`): the vertices (any shape ending in 3).
+
+    Returns:
+        `:obj:array`: the Mx3 distinct vertices.
+    """
+    vertices = np.reshape(vertices, (-1, 3))
+    vertices = vertices[np.all(np.isfinite(vertices), axis=1)]
+    if len(vertices) == 0:
+        return vertices
+    origin = np.min(vertices, axis=0)
+    offsets = vertices - origin
+    if np.all(vertices == np.around(vertices)) and np.all(offsets < 1 << 21):
+        # 21 bits per axis fit in a 63-bit key
+        offsets = offsets.astype(np.int64)
+        keys = np.unique((offsets[:, 0] << 42) | (offsets[:, 1] << 21) | offsets[:, 2])
+        return origin + np.stack(
+            (keys >> 42, (keys >> 21) & 0x1FFFFF, keys & 0x1FFFFF), axis=1
+        )
+    return np.unique(vertices, axis=0)
+
 class Design(APIModel):
     design_id: str = Field(
         ...,
@@ -28,11 +59,43 @@ class Design(APIModel):
         ...,
         description="Timestamp of design submission."
     )
-    bricks: List[Brick] = Field(
-        [],
+    bricks: BrickArray = Field(
+        default_factory=lambda: BrickArray.from_bricks([]),
         description="Constituent bricks in this design."
     )
 
+    # derived quantities, computed once and cleared when bricks change
+    _cache: dict = PrivateAttr(default_factory=dict)
+
+    class Config:
+        json_encoders = {
+            BrickArray: lambda bricks: [brick.dict(by_alias=True) for brick in bricks]
+        }
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name == "bricks":
+            self._cache.clear()
+
+    def get_cached(self, key, compute):
+        """
+        Get a derived quantity, computing it on first use.
+
+        Args:
+            key (hashable): the cache key.
+            compute (function): computes the quantity.
+
+        Returns:
+            object: the derived quantity.
+        """
+        if key not in self._cache:
+            value = compute()
+            if isinstance(value, np.ndarray):
+                # shared between callers, so guard against modification
+                value.flags.writeable = False
+            self._cache[key] = value
+        return self._cache[key]
+
     def get_convex_hull(self):
         """
         Get the convex hull about this design.
@@ -40,14 +103,34 @@ class Design(APIModel):
         Returns:
             `:obj:ConvexHull`: the convex hull.
         """
-        if len(self.get_valid_bricks()) > 0:
-            return ConvexHull(np.concatenate(tuple(
-                    brick.vertices
-                    for brick in self.get_valid_bricks()
-                )))
+        return self.get_cached("convex_hull", self._get_convex_hull)
+
+    def _get_convex_hull(self):
+        valid_bricks = self.get_valid_bricks()
+        if len(valid_bricks) > 0:
+            return ConvexHull(_get_unique_vertices(valid_bricks.vertices))
         else:
             return None
 
+    def _get_hull_vertices(self):
+        """
+        Get the points on the convex hull (i.e., excluding interior points).
+        """
+        def _compute():
+            hull = self.get_convex_hull()
+            return hull.points[hull.vertices] if hull is not None else np.zeros((0, 3))
+        return self.get_cached("hull_vertices", _compute)
+
+    def _get_steering_wheel_rotation(self):
+        """
+        Get the rotation matrix of the first steering wheel brick (bl_id 3829c01).
+
+        Returns:
+            `:obj:array`: the rotation matrix, or None if there is no steering wheel.
+        """
+        indices = np.flatnonzero(self.bricks.bl_id == "3829c01")
+        return self.bricks.rotation[indices[0]] if len(indices) > 0 else None
+
     def get_forward_axis(self):
         """
         Get a unit vector pointing in the "forward" direction.
@@ -55,14 +138,13 @@ class Design(APIModel):
         Returns:
             `:obj:array`: a unit vector pointing in the forward direction.
         """
-        # look for the first steering wheel brick (bl_id 3829c01)
-        for brick in self.bricks:
-            if brick.bl_id == "3829c01":
-                # transform valid axis by its rotation matrix
-                return np.matmul(
-                        brick.rotation,
-                        [0, 0, -1]
-                    )
+        return self.get_cached("forward_axis", self._get_forward_axis)
+
+    def _get_forward_axis(self):
+        rotation = self._get_steering_wheel_rotation()
+        if rotation is not None:
+            # transform valid axis by its rotation matrix
+            return np.matmul(rotation, [0, 0, -1])
         return np.array([1,0,0])
 
     def get_top_axis(self):
@@ -81,13 +163,12 @@ class Design(APIModel):
         Returns:
             `:obj:array`: a unit vector pointing in the driver side direction.
         """
-        # look for the first steering wheel brick (bl_id 3829c01)
-        for brick in self.bricks:
-            if brick.bl_id == "3829c01":
-                return np.matmul(
-                        brick.rotation,
-                        [1, 0, 0]
-                    )
+        return self.get_cached("driver_side_axis", self._get_driver_side_axis)
+
+    def _get_driver_side_axis(self):
+        rotation = self._get_steering_wheel_rotation()
+        if rotation is not None:
+            return np.matmul(rotation, [1, 0, 0])
         return np.array([0,0,1])
 
     def get_mass(self):
@@ -97,7 +178,7 @@ class Design(APIModel):
         Returns:
             float: the total mass (grams).
         """
-        return sum(brick.mass for brick in self.get_valid_bricks())
+        return sum(self.get_valid_bricks().mass.tolist())
 
     def get_cost(self):
         """
@@ -106,7 +187,7 @@ class Design(APIModel):
         Returns:
             float: the total cost ($).
         """
-        return sum(brick.cost for brick in self.get_valid_bricks())
+        return sum(self.get_valid_bricks().cost.tolist())
 
     def get_volume(self):
         """
@@ -125,11 +206,11 @@ class Design(APIModel):
         Returns:
             `:obj:array`: the length of the three dimensions (LDU, 1 LDU = 0.4 mm).
         """
-        hull = self.get_convex_hull()
-        return np.ptp(np.array([
-                hull.points[v,:]
-                for v in hull.vertices
-            ]), axis=0) if hull is not None else np.zeros(3)
+        return self.get_cached("size", self._get_size)
+
+    def _get_size(self):
+        vertices = self._get_hull_vertices()
+        return np.ptp(vertices, axis=0) if len(vertices) > 0 else np.zeros(3)
 
     def get_width(self):
         """
@@ -160,15 +241,18 @@ class Design(APIModel):
 
     def is_close_to_axis(self, brick, axis, tolerance=12):
         """
-        Determines whether a brick is positioned on the face defined by an axis.
+        Determines whether a brick (or each brick in an array) is positioned on
+        the face defined by an axis.
 
         Args:
-            brick (`:obj:Brick`): the brick for which to check alignment.
+            brick (`:obj:Brick` or `:obj:BrickArray`): the brick(s) for which
+                to check alignment.
             axis (`:obj:array`): unit vector pointing to the alignment face.
             tolerance (int): numerical tolerance.
 
         Returns:
-            bool: True, if the brick is positioned close to the designated axis.
+            bool or `:obj:array`: True, if the brick is positioned close to the
+                designated axis (for each brick, if given an array).
         """
         # check if the dot product of each vertex with the axis is close to
         # the maximum value of the dot product of the convex hull with the axis
@@ -177,11 +261,45 @@ class Design(APIModel):
         return np.any(
                 np.isclose(
                     np.dot(brick.vertices, axis),
-                    np.max(np.dot(self.get_convex_hull().points, axis), axis=0),
+                    self._get_hull_extent(axis),
                     atol=tolerance
-                )
+                ),
+                axis=-1
             )
 
+    def _get_hull_extent(self, axis):
+        """
+        Get the maximum dot product of the convex hull vertices with an axis
+        (NaN if there is no hull).
+        """
+        vertices = self._get_hull_vertices()
+        return self.get_cached(
+            ("hull_extent", tuple(np.ravel(axis).tolist())),
+            lambda: np.max(np.dot(vertices, axis), axis=0) if len(vertices) > 0 else np.nan
+        )
+
+    def _get_wheel_spread(self, axis):
+        """
+        Get the difference between the maximum and minimum wheel position
+        along an axis (0 if there are fewer than four wheels).
+        """
+        positions = self.get_wheel_positions()
+        if len(positions) < 4:
+            return 0
+        return np.around(np.ptp(np.dot(positions, axis)))
+
+    def get_wheel_positions(self):
+        """
+        Get the positions of the wheel bricks (bl_id 30027bc01).
+
+        Returns:
+            `:obj:array`: the Nx3 wheel positions.
+        """
+        return self.get_cached(
+            "wheel_positions",
+            lambda: self.bricks.position[self.bricks.bl_id == '30027bc01']
+        )
+
     def get_wheelbase(self):
         """
         Get the wheelbase (length between axels) of the design.
@@ -189,19 +307,9 @@ class Design(APIModel):
         Returns:
             float: the wheelbase (LDU, 1 LDU = 0.4 mm).
         """
-        if sum(1 for i in self.bricks if i.bl_id == '30027bc01') < 4:
-            return 0
         # find wheelbase by taking difference between maximum and minimum
         # wheel position in the direction of the forward axis
-        return np.around(
-                np.max([
-                    np.dot(self.get_forward_axis(), wheel.position)
-                    for wheel in self.bricks if wheel.bl_id == '30027bc01'
-                ]) - np.min([
-                    np.dot(self.get_forward_axis(), wheel.position)
-                    for wheel in self.bricks if wheel.bl_id == '30027bc01'
-                ])
-            )
+        return self._get_wheel_spread(self.get_forward_axis())
 
     def get_track(self):
         """
@@ -210,19 +318,9 @@ class Design(APIModel):
         Returns:
             float: the track (LDU, 1 LDU = 0.4 mm).
         """
-        if sum(1 for i in self.bricks if i.bl_id == '30027bc01') < 4:
-            return 0
         # find track by taking difference between maximum and minimum
         # wheel position in the direction of the driver side axis
-        return np.around(
-                np.max([
-                    np.dot(self.get_driver_side_axis(), wheel.position)
-                    for wheel in self.bricks if wheel.bl_id == '30027bc01'
-                ]) - np.min([
-                    np.dot(self.get_driver_side_axis(), wheel.position)
-                    for wheel in self.bricks if wheel.bl_id == '30027bc01'
-                ])
-            )
+        return self._get_wheel_spread(self.get_driver_side_axis())
 
     def get_num_components(self):
         """
@@ -231,51 +329,131 @@ class Design(APIModel):
         Returns:
             int: the number of connected components
         """
-        components = []
-        for brick in self.get_valid_bricks():
-            intersections = []
-            # loop over existing components
-            for component in components:
-                # loop over each brick in the component
-                for other_brick in component:
-                    # if intersects with brick, intersects with this component
-                    if brick.intersects(other_brick):
-                        intersections.append(component)
-                        break
-            # compile all the intersecting components
-            new_component = [brick]
-            # loop through each interaction
-            for component in intersections:
-                # loop through each brick of the component
-                for other_brick in component:
-                    # append the brick to the new component
-                    new_component.append(other_brick)
-                # remove the original component
-                components.remove(component)
-            # append a new component that composes all overlapping bricks
-            components.append(new_component)
-        return len(components)
+        labels = self.get_component_labels()
+        return int(np.max(labels)) + 1 if len(labels) > 0 else 0
+
+    def get_component_labels(self):
+        """
+        Get the connected component of each valid brick in the design.
+
+        Returns:
+            `:obj:array`: the component label of each valid brick (numbered
+                in order of first brick).
+        """
+        return self.get_cached(
+            "component_labels",
+            lambda: self.get_valid_bricks().get_component_labels(
+                pairs=self.get_overlap_pairs()
+            )
+        )
+
+    def get_spatial_index(self):
+        """
+        Get the spatial index over the bounding boxes of the valid bricks.
+
+        Returns:
+            `:obj:SpatialIndex`: the spatial index (indices refer to the
+                valid bricks).
+        """
+        return self.get_cached(
+            "spatial_index",
+            lambda: SpatialIndex(
+                self.get_valid_bricks().lower, self.get_valid_bricks().upper
+            )
+        )
+
+    def get_overlap_pairs(self):
+        """
+        Get the pairs of intersecting valid bricks (see `Brick.intersects`).
+
+        Returns:
+            (`:obj:array`, `:obj:array`): the first and second valid brick
+                indices of each pair (first < second).
+        """
+        return self.get_cached(
+            "overlap_pairs",
+            lambda: self.get_spatial_index().get_overlap_pairs(limit=PAIR_LIMIT)
+        )
+
+    def is_overlap_partial(self):
+        """
+        Determines whether the pairs of intersecting valid bricks are a partial
+        search (see `PAIR_LIMIT`), so connectivity and adjacency are approximate.
+
+        Returns:
+            bool: True, if some intersecting pairs may be missing.
+        """
+        return self.get_cached(
+            "overlap_partial",
+            lambda: self.get_spatial_index().count_candidate_pairs() > PAIR_LIMIT
+        )
+
+    def get_neighbors(self, lower, upper, inclusive=True):
+        """
+        Get the valid bricks that intersect (or touch) a bounding box.
+
+        Args:
+            lower (`:obj:array`): the lower bound (LDU).
+            upper (`:obj:array`): the upper bound (LDU).
+            inclusive (bool): True, if touching bricks are included.
+
+        Returns:
+            `:obj:BrickArray`: the neighboring valid bricks.
+        """
+        return self.get_valid_bricks().select(
+            self.get_spatial_index().query(lower, upper, inclusive)
+        )
+
+    def get_adjacency(self):
+        """
+        Get the sparse adjacency (intersection) matrix of the valid bricks.
+
+        Returns:
+            `:obj:csr_matrix`: the boolean adjacency matrix.
+        """
+        return self.get_cached(
+            "adjacency",
+            lambda: self.get_valid_bricks().get_adjacency(
+                pairs=self.get_overlap_pairs()
+            )
+        )
+
+    def get_alignment(self):
+        """
+        Get whether each brick is aligned with the forward axis (see
+        `Brick.is_aligned`).
+
+        Returns:
+            `:obj:array`: True, if the brick is properly aligned.
+        """
+        return self.get_cached(
+            "alignment",
+            lambda: self.bricks.get_alignment(self.get_forward_axis())
+        )
 
     def get_valid_bricks(self):
         """
-        Get the list of valid bricks.
+        Get the valid bricks.
 
         Returns:
-            List[`:obj:Brick`]: the list of valid bricks
+            `:obj:BrickArray`: the valid bricks
         """
-        return [brick for brick in self.bricks if brick.is_valid]
+        return self.get_cached(
+            "valid_bricks",
+            lambda: self.bricks.select(self.bricks.is_valid)
+        )
 
     def get_invalid_bricks(self):
         """
-        Get the list of invalid bricks.
+        Get the invalid bricks.
 
         Returns:
-            List[`:obj:Brick`]: the list of invalid bricks
+            `:obj:BrickArray`: the invalid bricks
         """
-        return [
-                brick for brick in self.bricks
-                if brick is None or not brick.is_valid
-            ]
+        return self.get_cached(
+            "invalid_bricks",
+            lambda: self.bricks.select(~self.bricks.is_valid)
+        )
 
     def get_num_seats(self):
         """
@@ -284,10 +462,7 @@ class Design(APIModel):
         Returns:
             int: the number of seats
         """
-        return sum(
-                1 for brick in self.get_valid_bricks()
-                if brick.bl_id == "4079b"
-            )
+        return int(np.count_nonzero(self.get_valid_bricks().bl_id == "4079b"))
 
     def get_cargo_volume(self):
         """
@@ -296,11 +471,10 @@ class Design(APIModel):
         Returns:
             float: the cargo volume (LDU^3, 1 LDU = 0.4 mm).
         """
-        return sum(
-                brick.volume
-                for brick in self.get_valid_bricks()
-                if brick.bl_id == "4345" or brick.bl_id == "4345b"
-            )
+        valid_bricks = self.get_valid_bricks()
+        return sum(valid_bricks.volume[
+                np.isin(valid_bricks.bl_id, ["4345", "4345b"])
+            ].tolist())
 
 class DesignAnalysis(APIModel):
     design_id: str = Field(
@@ -321,7 +495,19 @@ class DesignAnalysis(APIModel):
     )
     thumbnail: Optional[str] = Field(
         None,
-        description="Thumbnail image in base64 encoding."
+        description="Thumbnail preview image in base64 encoding."
+    )
+    thumbnail_size: Optional[int] = Field(
+        None,
+        description="Encoded size of the thumbnail preview image (bytes)."
+    )
+    thumbnail_detail: Optional[str] = Field(
+        None,
+        description="Thumbnail detail image in base64 encoding."
+    )
+    thumbnail_detail_size: Optional[int] = Field(
+        None,
+        description="Encoded size of the thumbnail detail image (bytes)."
     )
     mass: float = Field(
         ...,
@@ -391,9 +577,13 @@ class DesignAnalysis(APIModel):
         ...,
         description="Estimated net unit profit."
     )
-    total_roi: float = Field(
+    total_roi: Optional[float] = Field(
         ...,
-        description="Estimated return on investment."
+        description="Estimated return on investment (null for designs without cost)."
+    )
+    approximate: List[str] = Field(
+        [],
+        description="List of approximate fields, e.g., for designs analyzed with bounded-cost methods."
     )
 
 class DesignsResponse(APIModel):
@@ -413,3 +603,39 @@ class DesignsResponse(APIModel):
         ...,
         description="List of designs."
     )
+
+class DesignSummary(APIModel):
+    design_id: str = Field(
+        ...,
+        description="Unique identifier for this design."
+    )
+    name: str = Field(
+        ...,
+        description="Name of this design."
+    )
+    designer: str = Field(
+        ...,
+        description="Name of the designer."
+    )
+    timestamp: datetime = Field(
+        ...,
+        description="Timestamp of design submission."
+    )
+    number_bricks: Optional[int] = Field(
+        None,
+        description="Number of bricks (if parsed)."
+    )
+    stale_analyses: List[str] = Field(
+        ...,
+        description="List of analyses computed for this upload (others are reused)."
+    )
+
+class DesignStage(APIModel):
+    stage: str = Field(
+        ...,
+        description="Name of the stage (parse, requirements, value, cost, dsm, design or error)."
+    )
+    data: Any = Field(
+        ...,
+        description="Result of the stage: the design summary, an analysis, the stored design analysis or the error detail."
+    )
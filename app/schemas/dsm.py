@@ -1,15 +1,49 @@
 from fastapi_utils.api_model import APIModel
+import os
 from pydantic import Field
-from typing import List
+from typing import List, Optional
+
+# formats of the connectivity matrix
+DSM_DENSE = "dense"
+DSM_SPARSE = "sparse"
+
+# largest design (in bricks) whose matrix is available in the dense format
+MATRIX_LIMIT = int(os.getenv("ISE_DSM_MATRIX_LIMIT", 1000))
+
+class MatrixTooLarge(ValueError):
+    """
+    Raised when a dense matrix is requested for a design above `MATRIX_LIMIT`.
+    """
+    pass
+
+def check_format(dsm_format, size):
+    """
+    Checks whether a design structure matrix is available in a format.
+
+    Args:
+        dsm_format (str): the format (dense or sparse).
+        size (int): the number of columns/rows.
+
+    Raises:
+        MatrixTooLarge: if a dense matrix exceeds `MATRIX_LIMIT`.
+    """
+    if dsm_format == DSM_DENSE and size > MATRIX_LIMIT:
+        raise MatrixTooLarge(
+            "Design structure matrix with more than {} bricks is only available in the sparse format.".format(MATRIX_LIMIT)
+        )
 
 class DesignStructureMatrix(APIModel):
     version: str = Field(
         ...,
         description="Version number."
     )
-    matrix: List[List[bool]] = Field(
-        ...,
-        description="Binary connectivity matrix."
+    matrix: Optional[List[List[bool]]] = Field(
+        None,
+        description="Binary connectivity matrix (dense format)."
+    )
+    edges: Optional[List[List[int]]] = Field(
+        None,
+        description="List of connected [row, column] index pairs with row <= column, as the matrix is symmetric (sparse format)."
     )
     labels: List[str] = Field(
         ...,
@@ -19,3 +53,74 @@ class DesignStructureMatrix(APIModel):
         ...,
         description="List of column/row order indices."
     )
+    order_method: str = Field(
+        "optimal_leaf",
+        description="Method used to order the columns/rows (optimal_leaf, reverse_cuthill_mckee or none)."
+    )
+    approximate: List[str] = Field(
+        [],
+        description="List of approximate fields (order, if not ordered by optimal leaf ordering, and matrix or edges, if from a partial search for connected bricks)."
+    )
+
+    def to_format(self, dsm_format):
+        """
+        Get a copy of this design structure matrix in a format.
+
+        Args:
+            dsm_format (str): the format (dense or sparse).
+
+        Returns:
+            `:obj:DesignStructureMatrix`: the design structure matrix.
+
+        Raises:
+            MatrixTooLarge: if a dense matrix exceeds `MATRIX_LIMIT`.
+        """
+        check_format(dsm_format, len(self.labels))
+        if dsm_format == DSM_SPARSE:
+            return self.copy(update={
+                "matrix": None,
+                "edges": self.get_edges(),
+                "approximate": [
+                    "edges" if field == "matrix" else field
+                    for field in self.approximate
+                ]
+            })
+        return self.copy(update={
+            "matrix": self.get_matrix(),
+            "edges": None,
+            "approximate": [
+                "matrix" if field == "edges" else field
+                for field in self.approximate
+            ]
+        })
+
+    def get_edges(self):
+        """
+        Get the connected index pairs (sparse format).
+
+        Returns:
+            List[List[int]]: the [row, column] pairs with row <= column.
+        """
+        if self.edges is not None:
+            return self.edges
+        return [
+            [row, column]
+            for row, values in enumerate(self.matrix)
+            for column, value in enumerate(values[row:], row)
+            if value
+        ]
+
+    def get_matrix(self):
+        """
+        Get the binary connectivity matrix (dense format).
+
+        Returns:
+            List[List[bool]]: the matrix.
+        """
+        if self.matrix is not None:
+            return self.matrix
+        matrix = [[False]*len(self.labels) for _ in self.labels]
+        for row, column in self.edges:
+            matrix[row][column] = True
+            matrix[column][row] = True
+        return matrix
@@ -1,6 +1,50 @@
 from fastapi_utils.api_model import APIModel
 from pydantic import Field
-from typing import List
+from typing import Dict, List, Optional
+
+class PartRule(APIModel):
+    bl_ids: List[str] = Field(
+        ...,
+        description="BrickLink IDs of the required part."
+    )
+    bl_color: Optional[int] = Field(
+        None,
+        description="BrickLink color of the required part (any, if not set)."
+    )
+    count: int = Field(
+        ...,
+        description="Required count of (aligned and positioned) parts."
+    )
+    exact: bool = Field(
+        False,
+        description="True, if exactly the required count is allowed (otherwise at least)."
+    )
+    aligned: bool = Field(
+        False,
+        description="True, if parts must be aligned with the forward axis."
+    )
+    face: Optional[str] = Field(
+        None,
+        description="Face on which parts must be positioned (front, back or bottom), if any."
+    )
+
+class PartRequirement(APIModel):
+    value: bool = Field(
+        ...,
+        description="True, if the part rule is satisfied."
+    )
+    count: int = Field(
+        ...,
+        description="Part count."
+    )
+    alignment: Optional[List[bool]] = Field(
+        None,
+        description="List of whether parts are correctly aligned."
+    )
+    positioning: Optional[List[bool]] = Field(
+        None,
+        description="List of whether parts are correctly positioned."
+    )
 
 class ValidBricksRequirement(APIModel):
     value: bool = Field(
@@ -155,7 +199,15 @@ class RequirementsAnalysis(APIModel):
         ...,
         description="Requirement that at least one license plates is correctly aligned and positioned."
     )
+    additional_requirements: Dict[str, PartRequirement] = Field(
+        {},
+        description="Additional part requirements (see `PartRule`)."
+    )
     is_valid: bool = Field(
         ...,
         description="True, if all requirements are satisifed."
     )
+    approximate: List[str] = Field(
+        [],
+        description="List of approximate fields (from a partial search for connected bricks)."
+    )
@@ -0,0 +1,69 @@
+from fastapi_utils.api_model import APIModel
+from pydantic import Field
+from typing import List, Optional
+
+from .cost import CostParameters
+from .value import ValueParameters
+
+class Scenario(APIModel):
+    cost: CostParameters = Field(
+        CostParameters(),
+        description="Cost model parameters."
+    )
+    value: ValueParameters = Field(
+        ValueParameters(),
+        description="Value model parameters."
+    )
+    requirements: Optional[List[str]] = Field(
+        None,
+        description="Names of the requirements for a valid design (all, if not set)."
+    )
+    rank_by: str = Field(
+        "total_profit",
+        regex="^(total_cost|total_revenue|total_profit|total_roi)$",
+        description="Result by which to rank valid designs (then invalid designs)."
+    )
+
+class ScenarioDesign(APIModel):
+    design_id: str = Field(
+        ...,
+        description="Unique identifier for this design."
+    )
+    name: str = Field(
+        ...,
+        description="Name of this design."
+    )
+    designer: str = Field(
+        ...,
+        description="Name of the designer."
+    )
+    is_valid: bool = Field(
+        ...,
+        description="True, if the design meets the scenario requirements."
+    )
+    total_cost: Optional[float] = Field(
+        ...,
+        description="Total cost ($, null if not finite)."
+    )
+    total_revenue: Optional[float] = Field(
+        ...,
+        description="Total revenue ($, null if not finite)."
+    )
+    total_profit: Optional[float] = Field(
+        ...,
+        description="Total profit ($, null if not finite)."
+    )
+    total_roi: Optional[float] = Field(
+        ...,
+        description="Total return on investment (ROI, null if the total cost is not positive)."
+    )
+
+class ScenarioResponse(APIModel):
+    designs: List[ScenarioDesign] = Field(
+        ...,
+        description="List of designs in rank order."
+    )
+    skipped: List[str] = Field(
+        ...,
+        description="List of designs not analyzed with the current value model (re-upload to include)."
+    )
@@ -1,6 +1,118 @@
 from fastapi_utils.api_model import APIModel
 from pydantic import Field
-from typing import List
+from typing import List, Optional
+
+class LogisticParameters(APIModel):
+    min_value: float = Field(
+        ...,
+        description="Value at the low end of the transform."
+    )
+    max_value: float = Field(
+        ...,
+        description="Value at the high end of the transform."
+    )
+    midpoint: float = Field(
+        ...,
+        description="Point of the transform midway between the values."
+    )
+    growth_rate: float = Field(
+        ...,
+        description="Steepness of the transform."
+    )
+
+class ValueWeights(APIModel):
+    passenger: float = Field(
+        0.2,
+        description="Weight of the passenger capacity value metric."
+    )
+    cargo: float = Field(
+        0.2,
+        description="Weight of the cargo capacity value metric."
+    )
+    handling: float = Field(
+        0.1,
+        description="Weight of the handling value metric."
+    )
+    acceleration: float = Field(
+        0.15,
+        description="Weight of the acceleration value metric."
+    )
+    safety: float = Field(
+        0.15,
+        description="Weight of the safety value metric."
+    )
+    coolness: float = Field(
+        0.2,
+        description="Weight of the coolness value metric."
+    )
+
+class ValueParameters(APIModel):
+    passenger: LogisticParameters = Field(
+        LogisticParameters(min_value=0, max_value=100, midpoint=200, growth_rate=0.02),
+        description="Passenger capacity transform (seats*50 + volume)."
+    )
+    cargo: LogisticParameters = Field(
+        LogisticParameters(min_value=0, max_value=100, midpoint=125, growth_rate=0.03),
+        description="Cargo capacity transform (cargo volume*4 + volume)."
+    )
+    handling: LogisticParameters = Field(
+        LogisticParameters(min_value=100, max_value=0, midpoint=75, growth_rate=0.075),
+        description="Handling transform (mass + wheelbase)."
+    )
+    acceleration: LogisticParameters = Field(
+        LogisticParameters(min_value=100, max_value=0, midpoint=160, growth_rate=0.1),
+        description="Acceleration transform (mass*5 + height)."
+    )
+    safety: LogisticParameters = Field(
+        LogisticParameters(min_value=0, max_value=100, midpoint=80, growth_rate=0.04),
+        description="Safety transform (mass*2 + safety)."
+    )
+    coolness: LogisticParameters = Field(
+        LogisticParameters(min_value=0, max_value=100, midpoint=30, growth_rate=0.09),
+        description="Coolness transform (coolness)."
+    )
+    weights: ValueWeights = Field(
+        ValueWeights(),
+        description="Weights of the value metrics in the total value."
+    )
+    price: LogisticParameters = Field(
+        LogisticParameters(min_value=2, max_value=20, midpoint=50, growth_rate=0.1),
+        description="Market price transform (total value)."
+    )
+
+class ValueInputs(APIModel):
+    num_seats: int = Field(
+        ...,
+        description="Number of seats."
+    )
+    volume: float = Field(
+        ...,
+        description="Convex hull volume (cm^3)."
+    )
+    cargo_volume: float = Field(
+        ...,
+        description="Cargo volume (cm^3)."
+    )
+    mass: float = Field(
+        ...,
+        description="Mass (grams)."
+    )
+    wheelbase: float = Field(
+        ...,
+        description="Wheelbase (mm)."
+    )
+    height: float = Field(
+        ...,
+        description="Height (mm)."
+    )
+    safety: float = Field(
+        ...,
+        description="Total safety of aligned bricks."
+    )
+    coolness: float = Field(
+        ...,
+        description="Total coolness of bricks."
+    )
 
 class ValueAnalysis(APIModel):
     version: str = Field(
@@ -39,3 +151,7 @@ class ValueAnalysis(APIModel):
         ...,
         description="Estimated market price ($)."
     )
+    inputs: Optional[ValueInputs] = Field(
+        None,
+        description="Design inputs of the value model (to re-evaluate scenarios)."
+    )
@@ -0,0 +1,134 @@
+"""
+Benchmarks reading the design files from `.io` archives with the `IoArchive`
+reader against the standard library `zipfile` path.
+
+Run from the project root:
+
+    python -m benchmarks.archive
+"""
+import os
+import struct
+import timeit
+from zipfile import ZipFile
+import zlib
+
+from app.analysis.archive import CRC_TABLE, KEYSTREAM_TABLE, ZIP_KEY, _get_keys, read_design_files
+
+MODEL_A_PATH = os.path.join(os.path.dirname(__file__), '..', 'resources', 'ModelA.io')
+
+def _encrypt(data, pwd, check):
+    """
+    Encrypts data with ZipCrypto (prefixed with the 12-byte header).
+    """
+    table = CRC_TABLE
+    stream = KEYSTREAM_TABLE
+    k0, k1, k2 = _get_keys(pwd)
+    result = bytearray()
+    for c in os.urandom(11) + bytes([check]) + data:
+        result.append(c ^ stream[k2 & 0xFFFF])
+        k0 = (k0 >> 8) ^ table[(k0 ^ c) & 0xFF]
+        k1 = ((k1 + (k0 & 0xFF)) * 134775813 + 1) & 0xFFFFFFFF
+        k2 = (k2 >> 8) ^ table[(k2 ^ (k1 >> 24)) & 0xFF]
+    return bytes(result)
+
+def write_archive(io_path, members, pwd=ZIP_KEY):
+    """
+    Writes a ZipCrypto-encrypted, deflated archive like BrickLink Studio.
+
+    Args:
+        io_path (str): the archive path.
+        members (dict): the member contents (bytes) keyed by name.
+        pwd (bytes): the password.
+    """
+    central = []
+    with open(io_path, 'wb') as io_fp:
+        for name, contents in members.items():
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            crc = zlib.crc32(contents)
+            data = _encrypt(
+                compressor.compress(contents) + compressor.flush(),
+                pwd,
+                crc >> 24
+            )
+            fields = (20, 1, 8, 0, 0x21, crc, len(data), len(contents))
+            offset = io_fp.tell()
+            io_fp.write(struct.pack(
+                "<4s5HL2L2H", b"PK\003\004", *fields, len(name), 0
+            ))
+            io_fp.write(name.encode('utf-8'))
+            io_fp.write(data)
+            central.append(struct.pack(
+                "<4sH5HL2L5HLL", b"PK\001\002", 20, *fields,
+                len(name), 0, 0, 0, 0, 0, offset
+            ) + name.encode('utf-8'))
+        start = io_fp.tell()
+        for record in central:
+            io_fp.write(record)
+        io_fp.write(struct.pack(
+            "<4s4H2LH", b"PK\005\006", 0, 0, len(central), len(central),
+            io_fp.tell() - start, start, 0
+        ))
+
+def get_synthetic_members(scale):
+    """
+    Gets synthetic archive members scaled from Model A.
+
+    Args:
+        scale (int): the number of copies of the Model A files.
+
+    Returns:
+        dict: the member contents (bytes) keyed by name.
+    """
+    with ZipFile(MODEL_A_PATH) as zip:
+        members = {
+            info.filename: zip.read(info, ZIP_KEY)
+            for info in zip.infolist()
+        }
+    # repeat the model and pad the thumbnail with incompressible data
+    members['model.ldr'] = members['model.ldr']*scale
+    members['model2.ldr'] = members['model2.ldr']*scale
+    members['thumbnail.png'] = members['thumbnail.png'] + os.urandom(
+        len(members['thumbnail.png'])*(scale - 1)
+    )
+    return members
+
+def read_zipfile(io_path):
+    """
+    Reads the design files with the standard library `zipfile` module.
+    """
+    with ZipFile(io_path, 'r') as zip:
+        return zip.read('model.ldr', ZIP_KEY), zip.read('thumbnail.png', ZIP_KEY)
+
+def read_io_archive(io_path):
+    """
+    Reads the design files with the `IoArchive` reader.
+    """
+    with open(io_path, 'rb') as io_fp:
+        return read_design_files(io_fp)
+
+def benchmark(io_path, repeat=5):
+    """
+    Prints the best time of each reader for an archive.
+    """
+    baseline = min(timeit.repeat(lambda: read_zipfile(io_path), number=1, repeat=repeat))
+    optimized = min(timeit.repeat(lambda: read_io_archive(io_path), number=1, repeat=repeat))
+    print("{:<24} {:>10.1f} KB {:>10.1f} ms {:>10.1f} ms {:>8.2f}x".format(
+        os.path.basename(io_path),
+        os.path.getsize(io_path)/1024,
+        baseline*1000,
+        optimized*1000,
+        baseline/optimized
+    ))
+
+if __name__ == '__main__':
+    from tempfile import TemporaryDirectory
+    print("{:<24} {:>13} {:>13} {:>13} {:>9}".format(
+        "archive", "size", "zipfile", "IoArchive", "speedup"
+    ))
+    benchmark(MODEL_A_PATH)
+    with TemporaryDirectory() as tempdir:
+        for scale in (4, 16, 64):
+            io_path = os.path.join(tempdir, 'synthetic-{}x.io'.format(scale))
+            write_archive(io_path, get_synthetic_members(scale))
+            assert read_zipfile(io_path)[1] == read_io_archive(io_path)[2]
+            benchmark(io_path)
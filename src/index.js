@@ -16,6 +16,7 @@ import './favicon.ico';
 
 import { createDataTable } from "./tradespace-table.js"
 import { createChart } from "./tradespace-chart.js"
+import { getThumbnailUrl } from "./thumbnail.js"
 
 // helper function to format requirements analysis labels
 function updateRequirementsAnalysisLabel(id, isValid, message) {
@@ -84,8 +85,8 @@ function updateMarketAnalysisLabel(id, value) {
   }
 };
 
-// function to display information for a new design
-function displayDesign(data) {
+// function to show the results of a new design
+function displayResults(data) {
   // configure user interface components
   $("#design-file").val('');
   $("#design-file").siblings(".custom-file-label").removeClass("selected").html('Choose file');
@@ -94,9 +95,16 @@ function displayDesign(data) {
   $("#placeholder").addClass("d-none");
   $("#results").removeClass("d-none");
 
-  // set thumbnail image and caption
-  $("#thumbnail").attr("src", "data:image/png;base64," + data.thumbnail);
+  // set caption
   $('#thumbnail-caption').text(data.designer + ": " + data.name);
+};
+
+// function to display information for a new design
+function displayDesign(data) {
+  displayResults(data);
+
+  // set thumbnail image
+  $("#thumbnail").attr("src", getThumbnailUrl(data.thumbnailDetail || data.thumbnail));
 
   // set physical properties labels
   $("#physical-mass").text(data.mass.toFixed(2) + ' g');
@@ -109,110 +117,138 @@ function displayDesign(data) {
   $("#physical-number-seats").text(data.numberSeats);
   $("#physical-cargo-volume").text((data.cargoVolume).toFixed(1) + ' mL');
 
+  displayRequirements(data.requirements);
+  displayCost(data.cost);
+  displayValue(data.value);
+  displayDsm(data.dsm);
+};
+
+// function to display the requirements analysis of a design
+function displayRequirements(requirements) {
   // update requirements analysis labels
   updateRequirementsAnalysisLabel(
     "#requirement-bricks",
-    data.requirements.isOnlyValidBricks.value,
-    data.requirements.isOnlyValidBricks.value ? 'Valid' :
-    "Invalid bricks: " + data.requirements.isOnlyValidBricks.invalidBricks.map(function(id) {
+    requirements.isOnlyValidBricks.value,
+    requirements.isOnlyValidBricks.value ? 'Valid' :
+    "Invalid bricks: " + requirements.isOnlyValidBricks.invalidBricks.map(function(id) {
       return "<a href='https://www.bricklink.com/v2/catalog/catalogitem.page?P=" + id + "' target='_blank'>" + id + "</a>";
     }).join(", ") + "."
   );
   updateRequirementsAnalysisLabel(
     "#requirement-connected",
-    data.requirements.isFullyConnected.value,
-    data.requirements.isFullyConnected.value ? 'Valid' :
-    data.requirements.isFullyConnected.count + " components detected."
+    requirements.isFullyConnected.value,
+    requirements.isFullyConnected.value ? 'Valid' :
+    requirements.isFullyConnected.count + " components detected."
   );
   updateRequirementsAnalysisLabel(
     "#requirement-steering",
-    data.requirements.isOneSteeringWheel.value,
-    data.requirements.isOneSteeringWheel.value ? 'Valid' :
-    data.requirements.isOneSteeringWheel.count + " detected."
+    requirements.isOneSteeringWheel.value,
+    requirements.isOneSteeringWheel.value ? 'Valid' :
+    requirements.isOneSteeringWheel.count + " detected."
   );
   updateRequirementsAnalysisLabel(
     "#requirement-seat",
-    data.requirements.isMinOneSeatAligned.value,
-    getRequirementsAnalysisDescription(data.requirements.isMinOneSeatAligned, 1)
+    requirements.isMinOneSeatAligned.value,
+    getRequirementsAnalysisDescription(requirements.isMinOneSeatAligned, 1)
   );
   updateRequirementsAnalysisLabel(
     "#requirement-wheels",
-    data.requirements.isMinFourWheelsAlignedOnBottom.value,
-    getRequirementsAnalysisDescription(data.requirements.isMinFourWheelsAlignedOnBottom, 4)
+    requirements.isMinFourWheelsAlignedOnBottom.value,
+    getRequirementsAnalysisDescription(requirements.isMinFourWheelsAlignedOnBottom, 4)
   );
   updateRequirementsAnalysisLabel(
     "#requirement-headlights",
-    data.requirements.isMinTwoHeadlightsAlignedOnFront.value,
-    getRequirementsAnalysisDescription(data.requirements.isMinTwoHeadlightsAlignedOnFront, 2)
+    requirements.isMinTwoHeadlightsAlignedOnFront.value,
+    getRequirementsAnalysisDescription(requirements.isMinTwoHeadlightsAlignedOnFront, 2)
   );
   updateRequirementsAnalysisLabel(
     "#requirement-taillights",
-    data.requirements.isMinTwoTaillightsAlignedOnBack.value,
-    getRequirementsAnalysisDescription(data.requirements.isMinTwoTaillightsAlignedOnBack, 2)
+    requirements.isMinTwoTaillightsAlignedOnBack.value,
+    getRequirementsAnalysisDescription(requirements.isMinTwoTaillightsAlignedOnBack, 2)
   );
   updateRequirementsAnalysisLabel(
     "#requirement-plate",
-    data.requirements.isOneLicensePlateAlignedOnBack.value,
-    getRequirementsAnalysisDescription(data.requirements.isOneLicensePlateAlignedOnBack, 1)
+    requirements.isOneLicensePlateAlignedOnBack.value,
+    getRequirementsAnalysisDescription(requirements.isOneLicensePlateAlignedOnBack, 1)
   );
+};
 
+// function to display the cost analysis of a design
+function displayCost(cost) {
   // update cost analysis labels
-  $("#cost-materials").text('$' + data.cost.materials.toFixed(2));
+  $("#cost-materials").text('$' + cost.materials.toFixed(2));
   $("#cost-materials-collapse").html(
-    Object.keys(data.cost.bom).map(function(id) {
+    Object.keys(cost.bom).map(function(id) {
         return "<div class='row text-secondary'><div class='col-9'>"
-          + data.cost.bom[id].name
+          + cost.bom[id].name
           + " ("
-          + data.cost.bom[id].quantity
+          + cost.bom[id].quantity
           + " x $"
-          + data.cost.bom[id].cost.toFixed(3)
+          + cost.bom[id].cost.toFixed(3)
           + ")</div><div class='col-3'>$"
-          + (data.cost.bom[id].cost*data.cost.bom[id].quantity).toFixed(2)
+          + (cost.bom[id].cost*cost.bom[id].quantity).toFixed(2)
           + "</div></div>";
       }
     ).join('')
   );
-  $("#cost-assembly").text('$' + data.cost.assembly.total.toFixed(2));
-  $("#cost-assembly-components").text("$" + data.cost.assembly.components.toFixed(2));
-  $("#cost-assembly-integration").text("$" + data.cost.assembly.integration.toFixed(2));
-  $("#cost-overhead").text("$" + data.cost.overhead.total.toFixed(2));
-  $("#cost-overhead-marketing").text("$" + data.cost.overhead.marketing.toFixed(2));
-  $("#cost-overhead-engineering").text("$" + data.cost.overhead.engineering.toFixed(2));
-  $("#cost-overhead-facilities").text("$" + data.cost.overhead.facilities.toFixed(2));
-  $("#cost-overhead-administration").text("$" + data.cost.overhead.administration.toFixed(2));
-  $("#cost-total").text('$' + data.cost.total.toFixed(2));
+  $("#cost-assembly").text('$' + cost.assembly.total.toFixed(2));
+  $("#cost-assembly-components").text("$" + cost.assembly.components.toFixed(2));
+  $("#cost-assembly-integration").text("$" + cost.assembly.integration.toFixed(2));
+  $("#cost-overhead").text("$" + cost.overhead.total.toFixed(2));
+  $("#cost-overhead-marketing").text("$" + cost.overhead.marketing.toFixed(2));
+  $("#cost-overhead-engineering").text("$" + cost.overhead.engineering.toFixed(2));
+  $("#cost-overhead-facilities").text("$" + cost.overhead.facilities.toFixed(2));
+  $("#cost-overhead-administration").text("$" + cost.overhead.administration.toFixed(2));
+  $("#cost-total").text('$' + cost.total.toFixed(2));
+};
 
+// function to display the value analysis of a design
+function displayValue(value) {
   // update market analysis labels
-  updateMarketAnalysisLabel("#value-passenger", data.value.passenger);
-  updateMarketAnalysisLabel("#value-cargo", data.value.cargo);
-  updateMarketAnalysisLabel("#value-handling", data.value.handling);
-  updateMarketAnalysisLabel("#value-acceleration", data.value.acceleration);
-  updateMarketAnalysisLabel("#value-safety", data.value.safety);
-  updateMarketAnalysisLabel("#value-coolness", data.value.coolness);
-  updateMarketAnalysisLabel("#value-total", data.value.total);
-  $("#value-price").text("$" + data.value.price.toFixed(2));
+  updateMarketAnalysisLabel("#value-passenger", value.passenger);
+  updateMarketAnalysisLabel("#value-cargo", value.cargo);
+  updateMarketAnalysisLabel("#value-handling", value.handling);
+  updateMarketAnalysisLabel("#value-acceleration", value.acceleration);
+  updateMarketAnalysisLabel("#value-safety", value.safety);
+  updateMarketAnalysisLabel("#value-coolness", value.coolness);
+  updateMarketAnalysisLabel("#value-total", value.total);
+  $("#value-price").text("$" + value.price.toFixed(2));
+};
 
-  // update dsm analysis
-  var content = "<thead><tr><td></td>" + data.dsm.order.map(
+// function to display the design structure matrix of a design
+function displayDsm(dsm) {
+  // update dsm analysis (from the sparse edges, if provided)
+  var isConnected = function(row, column) {
+    return dsm.matrix[row][column];
+  };
+  if(dsm.edges) {
+    var connected = new Set(dsm.edges.map(function(edge) {
+      return edge[0] + "," + edge[1];
+    }));
+    isConnected = function(row, column) {
+      return connected.has(Math.min(row, column) + "," + Math.max(row, column));
+    };
+  }
+  var content = "<thead><tr><td></td>" + dsm.order.map(
       function(order, index){
         return "<th scope='col' class='text-center' style='width:2em;'><abbr title='"
-            + data.dsm.labels[order]
+            + dsm.labels[order]
             + "'>"
             + (index + 1)
             + "</abbr></th>";
         }
     ).join() + "</th><tr></thead><tbody>";
-  for(var i = 0; i < data.dsm.order.length; i++) {
+  for(var i = 0; i < dsm.order.length; i++) {
     content += "<tr scope='row' class='text-center'><th class='text-right'>"
         + (i+1)
         + ":&nbsp;"
-        + data.dsm.labels[data.dsm.order[i]].replace(" ", "&nbsp;")
+        + dsm.labels[dsm.order[i]].replace(" ", "&nbsp;")
         + "</th>"
-        + data.dsm.order.map(
+        + dsm.order.map(
           function(order, index) {
-            if(data.dsm.order[i] == order) {
+            if(dsm.order[i] == order) {
               return "<td class='bg-secondary text-secondary'>1</td>";
-            } else if(data.dsm.matrix[data.dsm.order[i]][order]) {
+            } else if(isConnected(dsm.order[i], order)) {
               return "<td class='bg-dark text-dark'>1</td>";
             } else {
               return "<td class='text-white'>0</td>";
@@ -224,6 +260,25 @@ function displayDesign(data) {
   $("#dsm").html(content);
 };
 
+// function to display a stage of a streamed design analysis
+function displayStage(stage) {
+  if(stage.stage == "parse") {
+    displayResults(stage.data);
+  } else if(stage.stage == "requirements") {
+    displayRequirements(stage.data);
+  } else if(stage.stage == "value") {
+    displayValue(stage.data);
+  } else if(stage.stage == "cost") {
+    displayCost(stage.data);
+  } else if(stage.stage == "dsm") {
+    displayDsm(stage.data);
+  } else if(stage.stage == "design") {
+    displayDesign(stage.data);
+  } else if(stage.stage == "error") {
+    $("#upload-message").text(stage.data.detail);
+  }
+};
+
 // helper function get an url parameter (e.g., /?id=the-design-id)
 // https://stackoverflow.com/questions/19491336/how-to-get-url-parameter-using-jquery-or-plain-javascript
 function getUrlParameter(sParam) {
@@ -257,15 +312,28 @@ function initializePage(user) {
       $("#upload-message").text("Max upload size is 10 MB.");
     } else {
       $("#upload-message").text('');
+      // display each stage (one line of json) as soon as it is received
+      var received = 0;
+      var readStages = function(text) {
+        var lines = text.substring(received).split("\n");
+        lines.slice(0, -1).forEach(function(line) {
+          received += line.length + 1;
+          displayStage(JSON.parse(line));
+        });
+      };
       $.ajax({
-        url: 'designs/',
+        url: 'designs/?dsm_format=sparse&stream=true',
         type: 'POST',
         data: new FormData($('#upload-design-form')[0]),
         cache: false,
         contentType: false,
         processData: false,
+        dataType: 'text',
         xhr: function () {
           var myXhr = $.ajaxSettings.xhr();
+          myXhr.addEventListener('progress', function () {
+            readStages(myXhr.responseText);
+          }, false);
           if (myXhr.upload) {
             myXhr.upload.addEventListener('progress', function (e) {
               if (e.lengthComputable) {
@@ -281,7 +349,17 @@ function initializePage(user) {
           }
           return myXhr;
         },
-        success: displayDesign
+        success: readStages,
+        error: function(xhr) {
+          var detail = "Could not upload design.";
+          try {
+            var response = JSON.parse(xhr.responseText);
+            if(typeof response.detail == "string") {
+              detail = response.detail;
+            }
+          } catch(e) {}
+          $("#upload-message").text(detail);
+        }
       });
     }
   });
@@ -302,7 +380,7 @@ function initializePage(user) {
   if(getUrlParameter('id')) {
     $.ajax({
       method: "GET",
-      url: 'designs/' + getUrlParameter('id'),
+      url: 'designs/' + getUrlParameter('id') + '?dsm_format=sparse',
       success: displayDesign
     });
   }
@@ -342,7 +420,7 @@ $(document).ready(function() {
   $(document).on('click', '.design-link', function() {
     $.ajax({
       method: "GET",
-      url: 'designs/' + $(this).attr("data-id"),
+      url: 'designs/' + $(this).attr("data-id") + '?dsm_format=sparse',
       success: displayDesign
     });
   });
@@ -351,7 +429,7 @@ $(document).ready(function() {
     if(confirm("Delete design " + $(this).attr("data-id") + "?")) {
       $.ajax({
         method: "DELETE",
-        url: 'designs/' + $(this).attr("data-id"),
+        url: 'designs/' + $(this).attr("data-id") + '?dsm_format=sparse',
         success: $('#tradespace-table').DataTable().draw
       });
     }
@@ -0,0 +1,7 @@
+// helper function to get the data url of a base64-encoded thumbnail image:
+// webp, or png for designs stored before thumbnails were encoded as webp
+export function getThumbnailUrl(thumbnail) {
+  // base64 encoding of the png signature
+  var isPng = thumbnail && thumbnail.startsWith("iVBORw0KGgo");
+  return "data:" + (isPng ? "image/png" : "image/webp") + ";base64," + thumbnail;
+};
@@ -1,5 +1,7 @@
 require('chart.js/dist/chart.min.js');
 
+import { getThumbnailUrl } from "./thumbnail.js"
+
 export function createChart(displayDesign) {
   return new Chart("tradespace-chart", {
     // configure as scatter plot
@@ -60,7 +62,7 @@ export function createChart(displayDesign) {
           // perform ajax request and display design
           $.ajax({
             method: "GET",
-            url: 'designs/' + id,
+            url: 'designs/' + id + '?dsm_format=sparse',
             success: displayDesign
           });
         }
@@ -102,8 +104,8 @@ export function createChart(displayDesign) {
             tooltipEl.html(
               tooltipModel.dataPoints.map(
                 function(dataPoint) {
-                  return "<div><img src='data:image/png;base64,"
-                    + dataPoint.raw.raw.thumbnail
+                  return "<div><img src='"
+                    + getThumbnailUrl(dataPoint.raw.raw.thumbnail)
                     + "' width='100' /><div class='small font-weight-light text-center'>"
                     + dataPoint.raw.raw.name
                     + "</div></div>";
@@ -4,6 +4,8 @@ require('datatables.net-bs4/js/dataTables.bootstrap4.min.js');
 
 var moment = require('moment');
 
+import { getThumbnailUrl } from "./thumbnail.js"
+
 export function createDataTable(user, chart) {
   return $("#tradespace-table").DataTable({
     // user server-side api
@@ -11,6 +13,10 @@ export function createDataTable(user, chart) {
     // ajax url for server-side api
     ajax: {
       url: "designs/",
+      data: function(d) {
+        // request the compact design structure matrix format
+        d.dsm_format = "sparse";
+      },
       dataSrc: "designs"
     },
     // default order by column 1 (timestamp) in descending order
@@ -28,7 +34,7 @@ export function createDataTable(user, chart) {
         render: function(data, type, row, meta) {
           return (
             "<a href='#' class='design-link' data-id='" + data.designId + "'>"
-            + "<img src='data:image/png;base64," + data['thumbnail'] + "' width='100' /></a>"
+            + "<img src='" + getThumbnailUrl(data['thumbnail']) + "' width='100' /></a>"
             + (user.is_superuser ?
               "<button type='button' class='btn btn-sm btn-outline-danger delete-button m-2' data-id='"
               + data.designId + "'><i class='fa fa-trash-alt'></i></button>" : ""
@@ -0,0 +1,157 @@
+import zipfile
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+from scipy import linalg, sparse
+from scipy.sparse import csgraph
+from scipy.cluster import hierarchy
+
+from app.analysis import utils
+from app.analysis.dsm import get_dsm_order, get_dsm_order_sparse
+from app.analysis.engines import ENGINES, ENGINE_FAST, ENGINE_REFERENCE, compare_fields
+from app.analysis.requirements import (
+    PART_RULES,
+    evaluate_part_rules,
+    evaluate_part_rules_reference
+)
+from app.analysis.spectral import DENSE_LIMIT, get_graph_energy
+from app.schemas.brick import SpatialIndex
+from app.schemas.design import Design
+
+MODEL_PATH = "resources/ModelA.io"
+MODEL_PASSWORD = b"soho0909"
+
+BRICK_LINE = "1 4 {} {} {} 1 0 0 0 1 0 0 0 1 3004.dat"
+
+def get_design(ldr_text):
+    return Design(
+        design_id="test",
+        name="Test",
+        designer="Test",
+        timestamp=datetime(2020, 1, 1, tzinfo=timezone.utc),
+        bricks=utils.get_brick_array(utils.parse_ldr(ldr_text))
+    )
+
+def get_stack(num_bricks, x=0, step=24):
+    # 1x2 bricks stacked with their studs overlapping (more than one brick
+    # for smaller steps)
+    return "\n".join(BRICK_LINE.format(x, -step*i, 0) for i in range(num_bricks))
+
+def get_model_text():
+    return zipfile.ZipFile(MODEL_PATH).read("model.ldr", MODEL_PASSWORD).decode()
+
+DESIGNS = {
+    "model": get_model_text,
+    "empty": lambda: "",
+    "single": lambda: get_stack(1),
+    "disconnected": lambda: get_stack(3) + "\n" + get_stack(3, x=200),
+    "unknown": lambda: "1 4 0 0 0 1 0 0 0 1 0 0 0 1 notapart.dat"
+}
+
+@pytest.fixture(params=list(DESIGNS))
+def design(request):
+    return get_design(DESIGNS[request.param]())
+
+def get_pairs_reference(bricks, inclusive=False):
+    # every pair of bricks (see `Brick.intersects`)
+    items = list(bricks)
+    return sorted(
+        (i, j)
+        for i in range(len(items)) for j in range(i + 1, len(items))
+        if items[i].intersects(items[j], inclusive)
+    )
+
+def as_pairs(pairs):
+    return sorted(zip(*(bricks.tolist() for bricks in pairs)))
+
+@pytest.mark.parametrize("inclusive", [False, True])
+def test_overlap_pairs(design, inclusive):
+    bricks = design.get_valid_bricks()
+    reference = get_pairs_reference(bricks, inclusive)
+    assert as_pairs(bricks.get_overlap_pairs(inclusive)) == reference
+    index = SpatialIndex(bricks.lower, bricks.upper)
+    assert as_pairs(index.get_overlap_pairs(inclusive)) == reference
+    # a coarser grid finds the same pairs
+    index = SpatialIndex(bricks.lower, bricks.upper, max_entries=0)
+    assert as_pairs(index.get_overlap_pairs(inclusive)) == reference
+
+def test_overlap_pairs_limit():
+    bricks = get_design(get_stack(50, step=8)).get_valid_bricks()
+    index = SpatialIndex(bricks.lower, bricks.upper, cell_size=np.full(3, 1000))
+    reference = as_pairs(index.get_overlap_pairs())
+    pairs = as_pairs(index.get_overlap_pairs(limit=10*len(bricks)))
+    # a partial search finds some pairs but keeps the stack connected
+    assert set(pairs) <= set(reference)
+    assert len(pairs) < len(reference)
+    labels = bricks.get_component_labels(pairs=tuple(np.array(p) for p in zip(*pairs)))
+    assert np.all(labels == 0)
+
+def test_component_labels(design):
+    bricks = design.get_valid_bricks()
+    labels = bricks.get_component_labels()
+    adjacency = bricks.get_adjacency()
+    num_components, reference = csgraph.connected_components(adjacency, directed=False)
+    assert len(np.unique(labels)) == num_components
+    # the same partition (labels are numbered in order of first brick)
+    assert np.array_equal(labels[:, None] == labels, reference[:, None] == reference)
+    assert design.get_num_components() == num_components
+
+def test_adjacency(design):
+    bricks = design.get_valid_bricks()
+    reference = np.zeros((len(bricks), len(bricks)), dtype=bool)
+    for i, j in get_pairs_reference(bricks):
+        reference[i, j] = reference[j, i] = True
+    np.fill_diagonal(reference, np.all(bricks.lower < bricks.upper, axis=1))
+    assert np.array_equal(design.get_adjacency().toarray(), reference)
+
+def test_graph_energy_estimate():
+    # a ring with random chords, just above the dense limit
+    size = DENSE_LIMIT + 1
+    rng = np.random.default_rng(0)
+    rows = np.concatenate((np.arange(size), rng.integers(0, size, size)))
+    cols = np.concatenate(((np.arange(size) + 1) % size, rng.integers(0, size, size)))
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=bool), (rows, cols)), shape=(size, size))
+    matrix = (matrix + matrix.T + sparse.identity(size, dtype=bool, format="csr")).astype(bool)
+    estimate = get_graph_energy(matrix)
+    reference = np.sum(np.abs(linalg.eigvalsh(matrix.toarray().astype(float) - np.eye(size))))
+    assert estimate.error > 0
+    assert abs(estimate.value - reference) <= estimate.error
+    # the exact path below the limit
+    exact = get_graph_energy(matrix, dense_limit=size)
+    assert exact.error == 0
+    assert exact.value == pytest.approx(reference)
+
+def test_dsm_order_optimal_leaf():
+    dsm = get_design(get_model_text()).get_adjacency().toarray()
+    reference = hierarchy.dendrogram(
+        hierarchy.linkage(dsm, method='single', optimal_ordering=True),
+        no_plot=True
+    )["leaves"]
+    assert get_dsm_order(dsm) == reference
+    # long chains do not recurse per level
+    chain = np.eye(1000, dtype=bool) | np.eye(1000, k=1, dtype=bool) | np.eye(1000, k=-1, dtype=bool)
+    assert sorted(get_dsm_order(chain)) == list(range(1000))
+
+def test_dsm_order_sparse():
+    adjacency = get_design(get_stack(200)).get_adjacency()
+    # shuffle the bricks of the stack
+    permutation = np.random.default_rng(0).permutation(adjacency.shape[0])
+    shuffled = adjacency[permutation][:, permutation]
+    order = get_dsm_order_sparse(shuffled)
+    assert sorted(order) == list(range(adjacency.shape[0]))
+    bandwidth = lambda matrix: np.max(np.abs(np.subtract(*matrix.nonzero())))
+    assert bandwidth(shuffled[order][:, order]) == 1
+    assert bandwidth(shuffled[order][:, order]) < bandwidth(shuffled)
+
+def test_part_rules(design):
+    assert (
+        evaluate_part_rules(design, PART_RULES)
+        == evaluate_part_rules_reference(design, PART_RULES)
+    )
+
+@pytest.mark.parametrize("analysis", list(ENGINES))
+def test_engines(design, analysis):
+    fast = ENGINES[analysis][ENGINE_FAST](design)
+    reference = ENGINES[analysis][ENGINE_REFERENCE](design)
+    assert compare_fields(fast, reference) == []